@@ -0,0 +1,37 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Writes a file so that it's replaced in a single operation, meaning other
+    processes never read a partially written file and an interrupted write never
+    leaves a corrupt one.
+
+    The data is written to a temporary file next to path, which is renamed over
+    path once the block finishes. If the block raises, the temporary file is
+    removed and path is left untouched. The temporary file is created readable
+    only by the current user, so the written file is too.
+
+    Example:
+        with atomic_write("/tmp/state.json") as handle:
+            json.dump(data, handle)
+
+    Args:
+        path (str): File to write
+        mode (str): Mode to open the temporary file with, eg, "wb"
+
+    Yields:
+        file: Open temporary file to write to
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, mode) as temp_file:
+            yield temp_file
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,88 @@
+"""
+Helpers shared by the command line tools that run a batch of work from a JSON
+lines file and print each result as it completes.
+"""
+import argparse
+import json
+import sys
+
+
+def read_json_lines(path, parse, name="entry"):
+    """
+    Reads a JSON lines file one line at a time, so very large files aren't loaded
+    into memory all at once. Blank lines are skipped.
+
+    Args:
+        path (str): JSON lines file
+        parse (callable): Called with each line's decoded JSON, returning the
+            value to yield. Can raise KeyError or ValueError if it's invalid.
+        name (str): What each line describes, used in error messages
+
+    Raises:
+        ValueError: If a line isn't valid JSON or parse rejects it, including
+            the line number
+
+    Yields:
+        object: Result of parse for each line
+    """
+    with open(path) as handle:
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield parse(json.loads(line))
+            except (ValueError, KeyError) as error:
+                raise ValueError(
+                    "Invalid {} on line {}: {}".format(name, line_number, error)
+                )
+
+
+def new_parser(doc):
+    """
+    Args:
+        doc (str): Module docstring, the first paragraph of which describes the
+            tool
+
+    Returns:
+        argparse.ArgumentParser: Parser with a --report argument, see
+            write_report
+    """
+    parser = argparse.ArgumentParser(description=doc.split("\n\n")[0].strip())
+    parser.add_argument("--report", help="Write the full report as JSON to this file")
+    return parser
+
+
+def progress_printer(message):
+    """
+    Args:
+        message (str): Format string for each result. Can use any of the
+            result's keys, plus count, the number of results so far, and
+            status, which is "ok" or the result's error.
+
+    Returns:
+        callable: Function taking a result dictionary with an "error" key, which
+            prints it straight away, even if the output is piped
+    """
+    count = 0
+
+    def print_progress(result):
+        nonlocal count
+        count += 1
+        status = "FAILED: " + result["error"] if result["error"] else "ok"
+        print(message.format(**dict(result, count=count, status=status)))
+        sys.stdout.flush()
+
+    return print_progress
+
+
+def write_report(path, report):
+    """
+    Args:
+        path (str): JSON file to write the report to. Nothing is written if it's
+            None, eg, --report wasn't given.
+        report (dict): Full result of the batch
+    """
+    if path:
+        with open(path, "w") as handle:
+            json.dump(report, handle, indent=2)
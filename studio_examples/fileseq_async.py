@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import os
+
+from fileseq_example import find_sequences
+from fileseq_journal import MoveJournal, get_move_func
+
+
+MOVED = "moved"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+# Progress of a single frame.
+#   index (int): Position of the frame in the sequence
+#   total (int): Number of frames in the sequence
+#   source (str): Frame that was moved
+#   destination (str): Path it was moved to
+#   status (str): MOVED, FAILED or SKIPPED
+#   error (Exception): Error the frame failed with, otherwise None
+FrameEvent = collections.namedtuple(
+    "FrameEvent", ["index", "total", "source", "destination", "status", "error"]
+)
+
+
+async def move_file_sequence_async(
+    source,
+    destination,
+    concurrency=8,
+    executor=None,
+    frames=None,
+    journal_path=None,
+):
+    """
+    Moves a sequence of files from source to destination without blocking the
+    event loop, yielding an event as each frame finishes.
+
+    All filesystem calls, including finding the sequence, run in an executor,
+    with at most `concurrency` frames being moved at a time.
+
+    Cancelling the task (or closing the iterator early) stops any new frames
+    from being started, and waits for the frames already being moved to finish
+    before returning. Moving a single frame is never interrupted, so every frame
+    is left either fully moved or untouched. If a journal is given, the move can
+    then be finished with fileseq_example.resume_move.
+
+    Example:
+        async for event in move_file_sequence_async(source, destination):
+            print("{}/{} {}".format(event.index + 1, event.total, event.status))
+
+    Args:
+        source (str): Sequence filepath, eg, /path/to/file.####.png
+        destination (str): Destination, using a single # for frames, eg,
+            /path/to/renamed.#.png
+        concurrency (int): Maximum number of frames to move at the same time
+        executor (concurrent.futures.Executor): Executor to run filesystem calls
+            in. Defaults to the event loop's default executor. Using a shared
+            executor limits the total number of threads across many moves.
+        frames (str | fileseq.FrameSet): Only move these frames
+        journal_path (str): File to record the progress of the move in
+
+    Yields:
+        FrameEvent: Progress of each frame, in the order they finish
+    """
+    loop = asyncio.get_running_loop()
+    sequences = await loop.run_in_executor(
+        executor, lambda: find_sequences(source, destination, frames=frames)
+    )
+    if sequences is None:
+        return
+    src_sequence, dst_sequence = sequences
+    frame_pairs = list(zip(src_sequence, dst_sequence))
+    total = len(frame_pairs)
+
+    move_func = await loop.run_in_executor(
+        executor,
+        get_move_func,
+        src_sequence.dirname() or os.curdir,
+        dst_sequence.dirname() or os.curdir,
+    )
+    journal = None
+    if journal_path is not None:
+        journal = MoveJournal(journal_path)
+        await loop.run_in_executor(executor, journal.start, frame_pairs)
+        move_func = journal.wrap(move_func)
+
+    # Frames are only submitted as earlier ones finish, rather than all up front,
+    # so that cancelling doesn't leave thousands of moves queued in the executor
+    pending = {}
+    next_index = 0
+    failed = False
+    try:
+        while next_index < total or pending:
+            while next_index < total and len(pending) < concurrency:
+                src_frame, dst_frame = frame_pairs[next_index]
+                if src_frame == dst_frame:
+                    yield FrameEvent(
+                        next_index, total, src_frame, dst_frame, SKIPPED, None
+                    )
+                else:
+                    future = loop.run_in_executor(
+                        executor, move_func, src_frame, dst_frame
+                    )
+                    pending[future] = next_index
+                next_index += 1
+            if not pending:
+                continue
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in sorted(done, key=pending.get):
+                index = pending.pop(future)
+                src_frame, dst_frame = frame_pairs[index]
+                error = future.exception()
+                if error is None:
+                    yield FrameEvent(index, total, src_frame, dst_frame, MOVED, None)
+                else:
+                    failed = True
+                    yield FrameEvent(index, total, src_frame, dst_frame, FAILED, error)
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if pending:
+            # The moves already running can't be stopped, so wait for them to
+            # finish to leave the sequence in a known state
+            await asyncio.wait(pending)
+        if journal is not None:
+            # Both flush to disk, so they're kept off the event loop thread
+            if failed or next_index < total:
+                await loop.run_in_executor(executor, journal.close)
+            else:
+                await loop.run_in_executor(executor, journal.finish, journal.COMMIT)
@@ -0,0 +1,235 @@
+"""
+Moves many sequences listed in a manifest, spreading them across processes.
+
+The manifest is a JSON lines file, with one sequence to move per line, eg,
+    {"source": "/renders/shot010/beauty.####.exr", "destination": "/archive/shot010/beauty.#.exr"}
+    {"source": "/renders/shot020/beauty.####.exr", "destination": "/archive/shot020/beauty.#.exr", "frames": "1001-1100"}
+
+Usage:
+    python fileseq_batch.py MANIFEST [--processes N] [--threads N] [--report FILE]
+"""
+import multiprocessing
+import sys
+import time
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+
+from batch_cli import new_parser, progress_printer, read_json_lines, write_report
+from fileseq_example import SequenceMoveError, move_file_sequence
+
+
+def _parse_entry(entry):
+    return {
+        "source": entry["source"],
+        "destination": entry["destination"],
+        "frames": entry.get("frames"),
+    }
+
+
+def read_manifest(path):
+    """
+    Reads the manifest one line at a time so very large manifests aren't loaded
+    into memory all at once.
+
+    Args:
+        path (str): JSON lines manifest file
+
+    Returns:
+        iterator[dict]: Keyword arguments for move_file_sequence for each
+            sequence
+    """
+    return read_json_lines(path, _parse_entry, name="manifest entry")
+
+
+def _new_result(entry):
+    return dict(entry, moved=0, skipped=0, failed=0, bytes=0, error=None, elapsed=0.0)
+
+
+def move_entry(entry, threads, incremental, verify):
+    """
+    Moves a single manifest entry. Runs in a worker process, so the result is a
+    plain dictionary that can be sent back to the main process.
+
+    Args:
+        entry (dict): Manifest entry, as returned by read_manifest
+        threads (int): Number of threads to move the sequence's frames with
+        incremental (bool): Skip frames that are already at the destination
+        verify (bool): Hash frames and write a manifest next to the destination
+
+    Returns:
+        dict: Result of moving the sequence
+    """
+    result = _new_result(entry)
+    start = time.perf_counter()
+    try:
+        summary = move_file_sequence(
+            entry["source"],
+            entry["destination"],
+            workers=threads,
+            frames=entry["frames"],
+            incremental=incremental,
+            verify=verify,
+        )
+    except SequenceMoveError as error:
+        summary = error.summary
+        result["error"] = str(error)
+    except Exception as error:
+        # Any other error, eg, a missing sequence, only fails this entry rather
+        # than the whole batch
+        summary = None
+        result["error"] = "{}: {}".format(type(error).__name__, error)
+
+    if summary is not None:
+        result["moved"] = len(summary.moved)
+        result["skipped"] = len(summary.skipped)
+        result["failed"] = len(summary.failed)
+        if summary.transfer is not None:
+            result["bytes"] = summary.transfer.bytes
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def move_batch(
+    entries, processes=None, threads=8, incremental=False, verify=False, callback=None
+):
+    """
+    Moves every entry across a pool of processes, each moving the frames of its
+    sequence across its own pool of threads. Only a limited number of entries are
+    queued at a time, so entries can be streamed from a very large manifest.
+
+    If a worker process dies, eg, killed for using too much memory, the pool is
+    replaced and the batch carries on. Every entry that was still queued or
+    moving in the old pool is reported as failed rather than retried, as it may
+    have been partly moved.
+
+    Args:
+        entries (iterable[dict]): Manifest entries, as returned by read_manifest
+        processes (int): Number of processes. Defaults to the number of cores.
+        threads (int): Number of threads per process
+        incremental (bool): Skip frames that are already at the destination
+        verify (bool): Hash frames and write a manifest next to each destination
+        callback (callable): Called with each result as soon as it completes
+
+    Returns:
+        list[dict]: Result of each entry, in the order they were given
+    """
+    processes = processes or multiprocessing.cpu_count()
+    max_pending = processes * 4
+    results = {}
+    # Maps each future to the index and entry it's moving
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            index, entry = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as error:
+                result = _new_result(entry)
+                result["error"] = "{}: {}".format(type(error).__name__, error)
+            results[index] = result
+            if callback is not None:
+                callback(result)
+
+    def replace_executor():
+        nonlocal executor
+        # A worker died, which fails every future of the pool, so they're all
+        # collected before the pool is replaced
+        collect(wait(pending).done)
+        executor.shutdown()
+        executor = ProcessPoolExecutor(max_workers=processes)
+
+    def wait_for(return_when):
+        done = wait(pending, return_when=return_when).done
+        if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+            replace_executor()
+        else:
+            collect(done)
+
+    def submit(index, entry):
+        args = (entry, threads, incremental, verify)
+        try:
+            future = executor.submit(move_entry, *args)
+        except BrokenProcessPool:
+            replace_executor()
+            future = executor.submit(move_entry, *args)
+        pending[future] = (index, entry)
+
+    executor = ProcessPoolExecutor(max_workers=processes)
+    try:
+        for index, entry in enumerate(entries):
+            if len(pending) >= max_pending:
+                wait_for(FIRST_COMPLETED)
+            submit(index, entry)
+        wait_for(ALL_COMPLETED)
+    finally:
+        executor.shutdown()
+
+    return [results[index] for index in sorted(results)]
+
+
+def main():
+    parser = new_parser(__doc__)
+    parser.add_argument("manifest", help="JSON lines file of sequences to move")
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes (default: number of cores)",
+    )
+    parser.add_argument(
+        "--threads", type=int, default=8, help="Threads per process (default: 8)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip frames that are already at the destination",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Hash frames as they're moved and write a manifest for each sequence",
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = move_batch(
+        read_manifest(args.manifest),
+        processes=args.processes,
+        threads=args.threads,
+        incremental=args.incremental,
+        verify=args.verify,
+        callback=progress_printer(
+            "[{count}] {source} -> {destination} : {moved} moved, {skipped} skipped, "
+            "{failed} failed : {status}"
+        ),
+    )
+    elapsed = time.perf_counter() - start
+
+    failures = [result for result in results if result["error"]]
+    frames = sum(result["moved"] for result in results)
+    total_bytes = sum(result["bytes"] for result in results)
+    print(
+        "\nMoved {} sequences ({} failed), {} frames, {:.1f} MB in {:.1f}s "
+        "({:.1f} frames/s)".format(
+            len(results) - len(failures),
+            len(failures),
+            frames,
+            total_bytes / (1024.0 * 1024.0),
+            elapsed,
+            frames / elapsed if elapsed else 0.0,
+        )
+    )
+
+    write_report(args.report, {"elapsed": elapsed, "sequences": results})
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Benchmarks finding and moving synthetic sequences, printing the results as JSON.
+
+Usage:
+    python fileseq_benchmark.py [--frames N] [--frame-size BYTES] [--sequences N]
+        [--workers 1,8,32] [--cross-dir DIR] [--output FILE]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import fileseq
+
+from fileseq_example import move_file_sequence
+from fileseq_index import SequenceIndex
+from fileseq_journal import same_device
+
+
+def make_sequences(directory, sequences, frames, frame_size):
+    """
+    Writes synthetic sequences named seq000.####.exr, seq001.####.exr, ...
+
+    Args:
+        directory (str): Directory to write the sequences in
+        sequences (int): Number of sequences
+        frames (int): Number of frames in each sequence, starting at 1001
+        frame_size (int): Number of bytes in each frame
+
+    Returns:
+        list[str]: Pattern of each sequence, eg, /path/to/seq000.####.exr
+    """
+    # The same random data is written to every frame, generating it is slower
+    # than writing it
+    data = os.urandom(frame_size)
+    patterns = []
+    for sequence in range(sequences):
+        basename = "seq{:03d}".format(sequence)
+        for frame in range(1001, 1001 + frames):
+            path = os.path.join(directory, "{}.{:04d}.exr".format(basename, frame))
+            with open(path, "wb") as handle:
+                handle.write(data)
+        patterns.append(os.path.join(directory, basename + ".####.exr"))
+    return patterns
+
+
+def _result(name, seconds, frames, nbytes=0, **extra):
+    result = {
+        "name": name,
+        "seconds": seconds,
+        "frames": frames,
+        "frames_per_second": frames / seconds if seconds else 0.0,
+        "mb_per_second": nbytes / (1024.0 * 1024.0) / seconds if seconds else 0.0,
+    }
+    result.update(extra)
+    return result
+
+
+def bench_discovery(patterns, frames):
+    """
+    Compares finding every sequence with fileseq.findSequenceOnDisk against a
+    single SequenceIndex of the directory.
+
+    Returns:
+        list[dict]: Result for each method
+    """
+    total = len(patterns) * frames
+
+    start = time.perf_counter()
+    for pattern in patterns:
+        fileseq.findSequenceOnDisk(pattern)
+    find_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = SequenceIndex(os.path.dirname(patterns[0]))
+    for pattern in patterns:
+        index.find_sequence(pattern)
+    index_seconds = time.perf_counter() - start
+
+    return [
+        _result("discovery_findSequenceOnDisk", find_seconds, total),
+        _result("discovery_SequenceIndex", index_seconds, total),
+    ]
+
+
+def bench_move(name, source_dir, destination_dir, args, workers):
+    """
+    Moves freshly generated sequences from source_dir to destination_dir.
+    Frames are only copied if the directories are on different devices,
+    otherwise they're renamed, which is recorded as same_device in the result.
+
+    Returns:
+        dict: Result of moving all sequences
+    """
+    patterns = make_sequences(source_dir, args.sequences, args.frames, args.frame_size)
+    index = SequenceIndex(source_dir)
+    total = len(patterns) * args.frames
+    methods = {}
+    # Renamed frames aren't copied, so only the bytes actually copied count
+    # towards the throughput
+    nbytes = 0
+
+    start = time.perf_counter()
+    for pattern in patterns:
+        destination = os.path.join(
+            destination_dir, "moved_" + os.path.basename(pattern).replace("####", "#")
+        )
+        summary = move_file_sequence(pattern, destination, workers=workers, index=index)
+        if summary.transfer is not None:
+            nbytes += summary.transfer.bytes
+            for method, count in summary.transfer.methods.items():
+                methods[method] = methods.get(method, 0) + count
+    seconds = time.perf_counter() - start
+
+    return _result(
+        name,
+        seconds,
+        total,
+        nbytes,
+        workers=workers,
+        methods=methods,
+        same_device=same_device(source_dir, destination_dir),
+    )
+
+
+def run(args):
+    """
+    Returns:
+        dict: Configuration and the result of every benchmark
+    """
+    root = tempfile.mkdtemp(prefix="fileseq_benchmark_")
+    cross_root = tempfile.mkdtemp(prefix="fileseq_benchmark_", dir=args.cross_dir)
+    results = []
+    try:
+        discovery_dir = os.path.join(root, "discovery")
+        os.mkdir(discovery_dir)
+        patterns = make_sequences(
+            discovery_dir, args.sequences, args.frames, args.frame_size
+        )
+        results.extend(bench_discovery(patterns, args.frames))
+        shutil.rmtree(discovery_dir)
+
+        for workers in args.workers:
+            case_dir = os.path.join(root, "same_{}".format(workers))
+            os.mkdir(case_dir)
+            results.append(
+                bench_move("move_same_directory", case_dir, case_dir, args, workers)
+            )
+            shutil.rmtree(case_dir)
+
+            case_dir = os.path.join(root, "cross_{}".format(workers))
+            destination_dir = os.path.join(cross_root, "cross_{}".format(workers))
+            os.mkdir(case_dir)
+            os.mkdir(destination_dir)
+            results.append(
+                bench_move(
+                    "move_cross_directory", case_dir, destination_dir, args, workers
+                )
+            )
+            shutil.rmtree(case_dir)
+            shutil.rmtree(destination_dir)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(cross_root, ignore_errors=True)
+
+    return {
+        "config": {
+            "frames": args.frames,
+            "frame_size": args.frame_size,
+            "sequences": args.sequences,
+            "workers": args.workers,
+            "cross_dir": args.cross_dir,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--frames", type=int, default=1000, help="Frames per sequence (default: 1000)"
+    )
+    parser.add_argument(
+        "--frame-size",
+        type=int,
+        default=64 * 1024,
+        help="Bytes per frame (default: 65536)",
+    )
+    parser.add_argument(
+        "--sequences",
+        type=int,
+        default=10,
+        help="Sequences per directory (default: 10)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=lambda value: [int(workers) for workers in value.split(",")],
+        default=[1, 8],
+        help="Comma separated numbers of threads to move with (default: 1,8)",
+    )
+    parser.add_argument(
+        "--cross-dir",
+        help="Directory to move sequences into for the cross directory benchmark, "
+        "eg, on another device. Frames are only copied if it's on a different "
+        "device to the system temp directory, which is the default.",
+    )
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import collections
+import json
+import os
+import time
+
+import fileseq
+
+from atomic_write import atomic_write
+from fileseq_index import SequenceIndex
+
+
+CACHE_VERSION = 1
+
+# Directories modified more recently than this are not cached, as a file added
+# within the same tick of the filesystem's clock wouldn't change the directory's
+# modification time. A tick is 1s on some NFS servers, so this allows for that
+# plus some clock drift between the client and server.
+RACY_NANOSECONDS = 2 * 10 ** 9
+
+
+class SequenceIndexCache(object):
+    """
+    Persistent cache of SequenceIndex objects, saved to a JSON file so that it can
+    be shared between runs of a script.
+
+    Each directory's index is stored with the modification time of the directory.
+    Adding, removing or renaming a file in a directory updates its modification
+    time, so as long as the time still matches, the cached index is used and the
+    directory doesn't need to be listed again. Only a single os.stat call is made.
+
+    Note that changes made to a file's contents don't change the directory's
+    modification time, but they don't change which frames exist either.
+
+    A directory that changed in the last few seconds, eg, one that renders are
+    still being written to, is scanned every time rather than cached, as a file
+    added in the same tick of the filesystem's clock as the scan would
+    otherwise be missed until the directory changed again.
+
+    When more than max_directories are cached, the least recently used directory
+    is dropped.
+
+    Example:
+        with SequenceIndexCache("/tmp/sequences.json") as cache:
+            index = cache.get("/path/to/renders")
+
+    Args:
+        path (str): JSON file to load the cache from and save it to
+        max_directories (int): Maximum number of directories to keep in the cache
+    """
+
+    def __init__(self, path, max_directories=256):
+        self.path = path
+        self.max_directories = max_directories
+        self.hits = 0
+        self.misses = 0
+        # Ordered from least to most recently used
+        self._entries = collections.OrderedDict()
+        self._load()
+
+    def __repr__(self):
+        return "SequenceIndexCache({!r}, directories={}, hits={}, misses={})".format(
+            self.path, len(self._entries), self.hits, self.misses
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.save()
+
+    def _load(self):
+        try:
+            with open(self.path) as handle:
+                data = json.load(handle)
+        except (IOError, OSError, ValueError):
+            # A missing or corrupt cache is simply treated as empty
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+
+        for directory, mtime, sequences in data["directories"]:
+            frames = {}
+            for basename, extension, padding, frame_range in sequences:
+                paddings = frames.setdefault((basename, extension), {})
+                paddings[padding] = list(fileseq.FrameSet(frame_range))
+            self._entries[directory] = (mtime, frames)
+
+    def save(self):
+        """
+        Writes the cache to disk. The file is replaced in a single operation so
+        that other processes never read a partially written cache.
+        """
+        directories = []
+        for directory, (mtime, frames) in self._entries.items():
+            sequences = []
+            for (basename, extension), paddings in frames.items():
+                for padding, frame_list in paddings.items():
+                    # Frame ranges are far more compact than the full list of frames
+                    frame_range = str(fileseq.FrameSet(sorted(frame_list)))
+                    sequences.append([basename, extension, padding, frame_range])
+            directories.append([directory, mtime, sequences])
+
+        with atomic_write(self.path) as handle:
+            json.dump({"version": CACHE_VERSION, "directories": directories}, handle)
+
+    def get(self, directory):
+        """
+        Args:
+            directory (str): Directory to get the index for
+
+        Returns:
+            SequenceIndex: Cached index if the directory hasn't changed since it
+                was cached, otherwise a newly scanned one
+        """
+        directory = os.path.abspath(directory)
+        mtime = os.stat(directory).st_mtime_ns
+
+        entry = self._entries.get(directory)
+        if entry is not None and entry[0] == mtime:
+            self.hits += 1
+            self._entries.move_to_end(directory)
+            return SequenceIndex(directory, frames=entry[1])
+
+        self.misses += 1
+        index = SequenceIndex(directory)
+        # Only cached if the directory didn't change during the scan and its
+        # modification time is old enough that a later change will update it
+        if (
+            os.stat(directory).st_mtime_ns == mtime
+            and time.time_ns() - mtime > RACY_NANOSECONDS
+        ):
+            self._entries[directory] = (mtime, index.to_frames())
+            self._entries.move_to_end(directory)
+            while len(self._entries) > self.max_directories:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.pop(directory, None)
+        return index
+
+    def invalidate(self, directory=None):
+        """
+        Args:
+            directory (str): Directory to remove from the cache. If not given, the
+                whole cache is cleared.
+        """
+        if directory is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(os.path.abspath(directory), None)
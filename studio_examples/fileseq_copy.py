@@ -0,0 +1,201 @@
+import errno
+import os
+import shutil
+import threading
+import time
+
+
+# Large chunks mean fewer system calls per frame. Multi-GB frames are common, so
+# this is deliberately much larger than shutil's default buffer size.
+CHUNK_SIZE = 16 * 1024 * 1024
+
+# Errors that mean a copy method isn't supported for this pair of files, rather
+# than that the copy itself went wrong
+_UNSUPPORTED_ERRORS = {
+    errno.ENOSYS,
+    errno.EXDEV,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+}
+
+COPY_FILE_RANGE = "copy_file_range"
+SENDFILE = "sendfile"
+USERSPACE = "userspace"
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _copy_file_range(src_fd, dst_fd, size, chunk_size):
+    # Copies entirely inside the kernel, and on filesystems that support it
+    # (eg, NFS 4.2, XFS, btrfs) may not need to copy the data at all
+    copied = 0
+    while copied < size:
+        try:
+            sent = os.copy_file_range(src_fd, dst_fd, min(chunk_size, size - copied))
+        except OSError as error:
+            if copied == 0 and error.errno in _UNSUPPORTED_ERRORS:
+                raise _Unsupported()
+            raise
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def _sendfile(src_fd, dst_fd, size, chunk_size):
+    # Copies inside the kernel, avoiding copying the data into python
+    copied = 0
+    while copied < size:
+        try:
+            sent = os.sendfile(dst_fd, src_fd, copied, min(chunk_size, size - copied))
+        except OSError as error:
+            if copied == 0 and error.errno in _UNSUPPORTED_ERRORS:
+                raise _Unsupported()
+            raise
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def _userspace(src_fd, dst_fd, size, chunk_size, hasher=None):
+    # Reads into a single reused buffer to avoid allocating a new one per chunk
+    copied = 0
+    buffer = memoryview(bytearray(chunk_size))
+    with open(src_fd, "rb", buffering=0, closefd=False) as src, open(
+        dst_fd, "wb", buffering=0, closefd=False
+    ) as dst:
+        while True:
+            read = src.readinto(buffer)
+            if not read:
+                break
+            dst.write(buffer[:read])
+            if hasher is not None:
+                hasher.update(buffer[:read])
+            copied += read
+    return copied
+
+
+# Fastest first. Methods that aren't available on this platform are left out.
+_COPY_METHODS = []
+if hasattr(os, "copy_file_range"):
+    _COPY_METHODS.append((COPY_FILE_RANGE, _copy_file_range))
+if hasattr(os, "sendfile") and os.name == "posix":
+    _COPY_METHODS.append((SENDFILE, _sendfile))
+_COPY_METHODS.append((USERSPACE, _userspace))
+
+
+def copy_file(source, destination, chunk_size=CHUNK_SIZE, hasher=None, sync=False):
+    """
+    Copies a file and its metadata, the same as shutil.copy2, using the fastest
+    method available. Copying in the kernel is tried first, falling back to
+    copying large chunks through python.
+
+    Args:
+        source (str): File to copy
+        destination (str): Path to copy the file to
+        chunk_size (int): Maximum number of bytes to copy in a single call
+        hasher (hashlib object): If given, the data is also added to the hash as
+            it's copied, so the file only needs to be read once. Data copied in
+            the kernel can't be hashed, so this always copies through python.
+        sync (bool): Flush the copied data to disk before returning, so it
+            survives a power loss. Slower, only needed if the source is about
+            to be removed.
+
+    Returns:
+        tuple[int, str]: Number of bytes copied, and the name of the method used
+    """
+    with open(source, "rb") as src, open(destination, "wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        if hasher is not None:
+            name = USERSPACE
+            copied = _userspace(src.fileno(), dst.fileno(), size, chunk_size, hasher)
+        else:
+            for name, method in _COPY_METHODS:
+                try:
+                    copied = method(src.fileno(), dst.fileno(), size, chunk_size)
+                except _Unsupported:
+                    continue
+                break
+        if sync:
+            os.fsync(dst.fileno())
+    shutil.copystat(source, destination)
+    return copied, name
+
+
+def hash_file(path, hasher, chunk_size=CHUNK_SIZE):
+    """
+    Args:
+        path (str): File to hash
+        hasher (hashlib object): Hash to add the file's data to
+        chunk_size (int): Number of bytes to read at a time
+
+    Returns:
+        int: Number of bytes read
+    """
+    total = 0
+    buffer = memoryview(bytearray(chunk_size))
+    with open(path, "rb", buffering=0) as handle:
+        while True:
+            read = handle.readinto(buffer)
+            if not read:
+                break
+            hasher.update(buffer[:read])
+            total += read
+    return total
+
+
+class TransferStats(object):
+    """
+    Thread-safe tally of the frames and bytes moved for a sequence, used to report
+    throughput and check which copy method was actually used.
+
+    Attributes:
+        frames (int): Number of frames moved
+        bytes (int): Number of bytes copied. Frames that were renamed aren't
+            copied, so don't count towards this.
+        methods (dict[str, int]): Number of frames moved with each method
+        elapsed (float): Seconds between start and stop
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.methods = {}
+        self.elapsed = 0.0
+        self._start = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "TransferStats(frames={}, {:.1f} frames/s, {:.1f} MB/s, methods={})".format(
+            self.frames, self.frames_per_second, self.mb_per_second, self.methods
+        )
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._start
+
+    def record(self, method, nbytes=0):
+        """
+        Args:
+            method (str): Name of the method used to move the frame
+            nbytes (int): Number of bytes copied to move the frame
+        """
+        with self._lock:
+            self.frames += 1
+            self.bytes += nbytes
+            self.methods[method] = self.methods.get(method, 0) + 1
+
+    @property
+    def frames_per_second(self):
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / (1024.0 * 1024.0) / self.elapsed if self.elapsed else 0.0
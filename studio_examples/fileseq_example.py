@@ -1,28 +1,482 @@
+import os
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import fileseq
 
+from fileseq_copy import TransferStats, hash_file
+from fileseq_journal import MoveJournal, get_move_func
+from fileseq_verify import Manifest, get_manifest_path
 
-def move_file_sequence(source, destination):
+
+class SequenceMoveError(Exception):
+    """Raised when one or more frames of a sequence failed to move"""
+
+    def __init__(self, summary):
+        self.summary = summary
+        super(SequenceMoveError, self).__init__(
+            "{} frame(s) failed to move, first error: {}".format(
+                len(summary.failed), summary.failed[0][1]
+            )
+        )
+
+
+class MoveSummary(object):
     """
-    Moves a sequence of files from source to destination
+    Results of moving a sequence. Every list is ordered by frame number so the
+    result is identical no matter how many workers were used.
+
+    Attributes:
+        moved (list[tuple[str, str]]): (source, destination) of each moved frame
+        failed (list[tuple[str, Exception]]): source and error of each failed frame
+        skipped (list[str]): Frames whose source and destination were the same
+            file, or that were already at the destination in an incremental move
+        transfer (fileseq_copy.TransferStats): Throughput of the move and the
+            methods used to move the frames, if they were recorded
+    """
+
+    def __init__(self):
+        self.moved = []
+        self.failed = []
+        self.skipped = []
+        self.transfer = None
+
+    def __repr__(self):
+        return "MoveSummary(moved={}, failed={}, skipped={}, transfer={})".format(
+            len(self.moved), len(self.failed), len(self.skipped), self.transfer
+        )
+
+
+def _move_frames(
+    frame_pairs, move_func=shutil.move, workers=1, max_in_flight=None, stats=None
+):
+    """
+    Moves each (source, destination) pair, optionally across a pool of threads.
+
+    Args:
+        frame_pairs (list[tuple[str, str]]): Source and destination of each frame
+        move_func (callable): Function taking (source, destination) that moves a
+            single frame
+        workers (int): Number of threads to move frames with. 1 moves serially in
+            the calling thread.
+        max_in_flight (int): Maximum number of moves queued on the pool at any one
+            time. Defaults to twice the number of workers.
+        stats (fileseq_copy.TransferStats): Stats that move_func records frames
+            in. The time taken to move all frames is added, and it's stored on
+            the summary.
+
+    Returns:
+        MoveSummary: The moved, failed and skipped frames
+    """
+    if stats is not None:
+        stats.start()
+
+    # Each result is stored at the index of its frame so that the summary comes
+    # out in frame order, regardless of which thread finished first
+    results = [None] * len(frame_pairs)
+
+    def move(index, src_frame, dst_frame):
+        if src_frame == dst_frame:
+            results[index] = ("skipped", src_frame)
+            return
+        try:
+            move_func(src_frame, dst_frame)
+        except Exception as error:
+            results[index] = ("failed", (src_frame, error))
+        else:
+            results[index] = ("moved", (src_frame, dst_frame))
+
+    if workers <= 1:
+        for index, (src_frame, dst_frame) in enumerate(frame_pairs):
+            move(index, src_frame, dst_frame)
+    else:
+        # The semaphore stops the whole sequence being queued up front, which
+        # would hold every future in memory for very long sequences
+        in_flight = threading.BoundedSemaphore(max_in_flight or workers * 2)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for index, (src_frame, dst_frame) in enumerate(frame_pairs):
+                in_flight.acquire()
+                future = executor.submit(move, index, src_frame, dst_frame)
+                future.add_done_callback(lambda _: in_flight.release())
+
+    summary = MoveSummary()
+    for status, value in results:
+        getattr(summary, status).append(value)
+    if stats is not None:
+        stats.stop()
+        summary.transfer = stats
+    return summary
+
+
+def _is_same_file(source, destination):
+    # copy2 and rename both keep the modification time, so a destination that
+    # matches the source's size and modification time is a finished copy of it.
+    # On the same filesystem the times are compared exactly. Across filesystems
+    # one may only store whole seconds, so sub-second differences are ignored.
+    src_stat = os.stat(source)
+    dst_stat = os.stat(destination)
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if src_stat.st_dev == dst_stat.st_dev:
+        return src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+    return int(src_stat.st_mtime) == int(dst_stat.st_mtime)
+
+
+def _split_already_moved(frame_pairs, destination_dir):
+    """
+    Args:
+        frame_pairs (list[tuple[str, str]]): Source and destination of each frame
+        destination_dir (str): Directory all the destination frames are in
+
+    Returns:
+        tuple[list[tuple[str, str]], list[str]]: Frame pairs that still need to
+            be moved, and the sources of frames that already exist at the
+            destination
+    """
+    # A single listing of the destination is much cheaper than checking whether
+    # each destination frame exists individually
+    try:
+        with os.scandir(destination_dir) as entries:
+            existing = {entry.name for entry in entries}
+    except FileNotFoundError:
+        return frame_pairs, []
+
+    pending = []
+    already_moved = []
+    for src_frame, dst_frame in frame_pairs:
+        if (
+            src_frame != dst_frame
+            and os.path.basename(dst_frame) in existing
+            and _is_same_file(src_frame, dst_frame)
+        ):
+            already_moved.append(src_frame)
+        else:
+            pending.append((src_frame, dst_frame))
+    return pending, already_moved
+
+
+def _tolerate_moved(move_func):
+    # When resuming or rolling back, the frame that was being moved when the
+    # process stopped may or may not have been moved before it was recorded. If
+    # the file is already at the destination, there's nothing left to do.
+    def move(source, destination):
+        try:
+            move_func(source, destination)
+        except FileNotFoundError:
+            if os.path.exists(source) or not os.path.exists(destination):
+                raise
+
+    return move
+
+
+def _run_journaled(
+    journal, frame_pairs, move_func, workers, max_in_flight, stats, op
+):
+    summary = _move_frames(
+        frame_pairs,
+        move_func=journal.wrap(move_func),
+        workers=workers,
+        max_in_flight=max_in_flight,
+        stats=stats,
+    )
+    if summary.failed:
+        journal.close()
+    else:
+        journal.finish(op)
+    return summary
+
+
+def find_sequences(source, destination, index=None, cache=None, frames=None):
+    """
+    Finds the frames of a source sequence on disk and the matching destination
+    sequence to move them to.
 
     Args:
         source (str): Sequence filepath, eg, /path/to/file.####.png
         destination (str): Destination, using a single # for frames, eg,
             /path/to/renamed.#.png
+        index (fileseq_index.SequenceIndex): Index to find the source frames in
+            instead of listing the directory
+        cache (fileseq_cache.SequenceIndexCache): Cache to get the index from,
+            if no index is given
+        frames (str | fileseq.FrameSet): Only include these frames
+
+    Raises:
+        fileseq.FileSeqException: If the source sequence doesn't exist
+
+    Returns:
+        tuple[fileseq.FileSequence, fileseq.FileSequence]: The source and
+            destination sequences, with the same frames. None if none of the
+            requested frames exist.
     """
-    src_sequence = fileseq.findSequenceOnDisk(source)
+    if index is None and cache is not None:
+        index = cache.get(os.path.dirname(source) or os.curdir)
+    if index is not None:
+        src_sequence = index.find_sequence(source)
+    else:
+        src_sequence = fileseq.findSequenceOnDisk(source)
+    if frames is not None:
+        frame_set = src_sequence.frameSet() & fileseq.FrameSet(frames)
+        if not frame_set:
+            return None
+        src_sequence.setFrameSet(frame_set)
     dst_sequence = fileseq.FileSequence(destination.replace("#", "1-1#"))
     dst_sequence.setFrameSet(src_sequence.frameSet())
-    for src_frame, dst_frame in zip(src_sequence, dst_sequence):
-        shutil.move(src_frame, dst_frame)
+    return src_sequence, dst_sequence
 
 
-if __name__ == '__main__':
-    import os
+def move_file_sequence(
+    source,
+    destination,
+    workers=1,
+    max_in_flight=None,
+    index=None,
+    cache=None,
+    journal_path=None,
+    verify=False,
+    frames=None,
+    incremental=False,
+):
+    """
+    Moves a sequence of files from source to destination
+
+    Args:
+        source (str): Sequence filepath, eg, /path/to/file.####.png
+        destination (str): Destination, using a single # for frames, eg,
+            /path/to/renamed.#.png
+        workers (int): Number of threads to move frames with. Moves are mostly
+            spent waiting on the filesystem, so network storage benefits from
+            many more workers than there are cores.
+        max_in_flight (int): Maximum number of moves queued at any one time
+        index (fileseq_index.SequenceIndex): Index of the source directory to
+            find the source frames in. Moving several sequences out of the same
+            directory with one index only lists the directory once.
+        cache (fileseq_cache.SequenceIndexCache): Cache to get the index of the
+            source directory from, if no index is given. Unchanged directories
+            are not listed again.
+        journal_path (str): File to record the progress of the move in. If the
+            move is interrupted, it can be finished with resume_move or undone
+            with rollback_move.
+        verify (bool): If True, every frame is hashed as it's moved and the
+            digests are written to a manifest next to the destination sequence.
+            The destination can then be checked at any time with
+            fileseq_verify.validate_sequence.
+        frames (str | fileseq.FrameSet): Only move these frames, eg, "1001-1050".
+            Frames that don't exist in the source are ignored.
+        incremental (bool): If True, frames that already exist at the destination
+            with the same size and modification time as the source are not
+            moved again, their source is simply removed. This allows a move that
+            was killed part way through to be run again, only moving the frames
+            that are left. With verify, any of these frames missing from the
+            manifest are hashed at the destination.
+
+    Raises:
+        SequenceMoveError: If any frame failed to move. All other frames are
+            still moved and the summary is available on the error.
+
+    Returns:
+        MoveSummary: The moved, failed and skipped frames
+    """
+    sequences = find_sequences(
+        source, destination, index=index, cache=cache, frames=frames
+    )
+    if sequences is None:
+        return MoveSummary()
+    src_sequence, dst_sequence = sequences
+    frame_pairs = list(zip(src_sequence, dst_sequence))
+
+    already_moved = []
+    remove_failed = []
+    if incremental:
+        frame_pairs, already_moved = _split_already_moved(
+            frame_pairs, dst_sequence.dirname() or os.curdir
+        )
+        for src_frame in list(already_moved):
+            try:
+                os.remove(src_frame)
+            except OSError as error:
+                already_moved.remove(src_frame)
+                remove_failed.append((src_frame, error))
+
+    # Frames in the same sequence all live in the same directory, so whether they
+    # can be renamed or have to be copied only needs to be checked once
+    stats = TransferStats()
+    manifest = Manifest(get_manifest_path(destination)) if verify else None
+    move_func = get_move_func(
+        src_sequence.dirname() or os.curdir,
+        dst_sequence.dirname() or os.curdir,
+        stats=stats,
+        manifest=manifest,
+    )
+
+    try:
+        if manifest is not None and already_moved:
+            dst_frames = dict(zip(src_sequence, dst_sequence))
+            _hash_unrecorded(manifest, [dst_frames[frame] for frame in already_moved])
+
+        if journal_path is not None:
+            journal = MoveJournal(journal_path)
+            journal.start(
+                frame_pairs, manifest_path=None if manifest is None else manifest.path
+            )
+            summary = _run_journaled(
+                journal,
+                frame_pairs,
+                move_func,
+                workers,
+                max_in_flight,
+                stats,
+                journal.COMMIT,
+            )
+        else:
+            summary = _move_frames(
+                frame_pairs,
+                move_func=move_func,
+                workers=workers,
+                max_in_flight=max_in_flight,
+                stats=stats,
+            )
+    finally:
+        # Saved even if some frames failed so the frames that did move can
+        # still be validated
+        if manifest is not None:
+            manifest.save()
+
+    if already_moved or remove_failed:
+        # Keep the skipped and failed frames in frame order, the same as a full
+        # move
+        order = {src_frame: index for index, src_frame in enumerate(src_sequence)}
+        summary.skipped = sorted(summary.skipped + already_moved, key=order.get)
+        summary.failed = sorted(
+            summary.failed + remove_failed, key=lambda failure: order[failure[0]]
+        )
+    if summary.failed:
+        raise SequenceMoveError(summary)
+    return summary
+
+
+def _hash_unrecorded(manifest, dst_frames):
+    # A run that was killed never saved its manifest, so frames it moved are
+    # hashed now or they'd never be validated
+    for dst_frame in dst_frames:
+        if os.path.basename(dst_frame) not in manifest.digests:
+            hasher = manifest.new_hash()
+            hash_file(dst_frame, hasher)
+            manifest.record(dst_frame, hasher.hexdigest())
+
+
+def resume_move(journal_path, workers=1, max_in_flight=None):
+    """
+    Finishes moving a sequence that was interrupted, using the journal written by
+    move_file_sequence rather than searching the directories for what's left. If
+    the move was verified, the frames are hashed into the same manifest.
 
-    move_file_sequence(
-        os.path.join(os.path.dirname(__file__), "sequence", "render.####.png"),
-        os.path.join(os.path.dirname(__file__), "sequence", "example.#.png"),
+    Args:
+        journal_path (str): Journal of the interrupted move
+        workers (int): Number of threads to move frames with
+        max_in_flight (int): Maximum number of moves queued at any one time
+
+    Raises:
+        SequenceMoveError: If any frame failed to move
+
+    Returns:
+        MoveSummary: The frames moved by this call. Empty if the move had already
+            finished or been rolled back.
+    """
+    journal = MoveJournal(journal_path)
+    frame_pairs, done, state, manifest_path = journal.read()
+    pending = [pair for pair in frame_pairs if pair[0] not in done]
+    if state is not None or not pending:
+        return MoveSummary()
+
+    src_frame, dst_frame = pending[0]
+    stats = TransferStats()
+    manifest = Manifest(manifest_path) if manifest_path is not None else None
+    move_func = get_move_func(
+        os.path.dirname(src_frame) or os.curdir,
+        os.path.dirname(dst_frame) or os.curdir,
+        stats=stats,
+        manifest=manifest,
+    )
+    try:
+        if manifest is not None:
+            # Includes the frame that was being moved when the process stopped,
+            # which may have been moved without being recorded
+            _hash_unrecorded(
+                manifest,
+                [
+                    dst_frame
+                    for src_frame, dst_frame in frame_pairs
+                    if not os.path.exists(src_frame) and os.path.isfile(dst_frame)
+                ],
+            )
+        summary = _run_journaled(
+            journal,
+            pending,
+            _tolerate_moved(move_func),
+            workers,
+            max_in_flight,
+            stats,
+            journal.COMMIT,
+        )
+    finally:
+        if manifest is not None:
+            manifest.save()
+    if summary.failed:
+        raise SequenceMoveError(summary)
+    return summary
+
+
+def rollback_move(journal_path, workers=1, max_in_flight=None):
+    """
+    Moves every frame of an interrupted move back to where it came from, using the
+    journal written by move_file_sequence.
+
+    Args:
+        journal_path (str): Journal of the interrupted move
+        workers (int): Number of threads to move frames with
+        max_in_flight (int): Maximum number of moves queued at any one time
+
+    Raises:
+        SequenceMoveError: If any frame failed to move back
+
+    Returns:
+        MoveSummary: The frames moved back by this call, as (destination, source)
+    """
+    journal = MoveJournal(journal_path)
+    frame_pairs, _, state, _ = journal.read()
+    if state == journal.ROLLBACK or not frame_pairs:
+        return MoveSummary()
+
+    # Every planned frame is reversed, not just those recorded as done, as the
+    # frames being moved when the process stopped may not have been recorded
+    reversed_pairs = [(dst_frame, src_frame) for src_frame, dst_frame in frame_pairs]
+    dst_frame, src_frame = reversed_pairs[0]
+    stats = TransferStats()
+    move_func = get_move_func(
+        os.path.dirname(dst_frame) or os.curdir,
+        os.path.dirname(src_frame) or os.curdir,
+        stats=stats,
+    )
+    summary = _run_journaled(
+        journal,
+        reversed_pairs,
+        _tolerate_moved(move_func),
+        workers,
+        max_in_flight,
+        stats,
+        journal.ROLLBACK,
+    )
+    if summary.failed:
+        raise SequenceMoveError(summary)
+    return summary
+
+
+if __name__ == '__main__':
+    print(
+        move_file_sequence(
+            os.path.join(os.path.dirname(__file__), "sequence", "render.####.png"),
+            os.path.join(os.path.dirname(__file__), "sequence", "example.#.png"),
+        )
     )
@@ -0,0 +1,194 @@
+import os
+import re
+
+import fileseq
+
+
+# Splits a filename into basename, frame number and extension. This follows the
+# same rules fileseq uses when reading sequences from disk, eg,
+#   render.0001.exr -> ("render.", "0001", ".exr")
+#   comp_v002.1001.tar.gz -> ("comp_v002.", "1001", ".tar.gz")
+FRAME_RE = re.compile(
+    r"""
+    \A
+    (.*?)                   # basename (non-greedy)
+    (-?\d+)                 # frame
+    (
+        (?:\.\w*[a-zA-Z]\w?)*   # optional leading alnum ext prefix
+        (?:\.[^.]+)?            # ext suffix
+    )
+    \Z
+    """,
+    re.VERBOSE,
+)
+
+
+class SequenceIndex(object):
+    """
+    Every frame in a single directory, grouped by sequence.
+
+    The directory is listed once when the index is created, after which looking
+    up the frames of any sequence in it is a single dictionary lookup. This makes
+    it much cheaper than calling fileseq.findSequenceOnDisk for each sequence,
+    which lists the whole directory every time.
+
+    Frames are grouped by their basename and extension, and then by padding (the
+    width of the frame, including any minus sign). As with
+    fileseq.findSequenceOnDisk, lookups ignore the padding in the pattern unless
+    strict_padding is used, and frames of different paddings are only treated as
+    one sequence if the wider frames are unpadded, eg, 0998, 0999, 1000, 10000.
+
+    Note that the index is a snapshot: files added or removed after it was built
+    are not seen until a new index is created.
+
+    Args:
+        directory (str): Directory to index
+        frames (dict): Previously scanned frames to use instead of listing the
+            directory, as returned by to_frames
+    """
+
+    def __init__(self, directory, frames=None):
+        self.directory = os.path.abspath(directory)
+        if frames is None:
+            frames = self._scan(self.directory)
+        self._frames = frames
+
+    def __repr__(self):
+        return "SequenceIndex({!r}, sequences={})".format(
+            self.directory, len(self._frames)
+        )
+
+    def __len__(self):
+        return len(self._frames)
+
+    @staticmethod
+    def _scan(directory):
+        frames = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = FRAME_RE.match(entry.name)
+                if match is None or not entry.is_file():
+                    continue
+                basename, frame, extension = match.groups()
+                paddings = frames.setdefault((basename, extension), {})
+                paddings.setdefault(len(frame), []).append(int(frame))
+        return frames
+
+    def to_frames(self):
+        """
+        Returns:
+            dict: Frames found in the directory, mapping (basename, extension) to
+                {padding: [frame]}. Can be passed back to the constructor to
+                recreate the index without listing the directory again.
+        """
+        return self._frames
+
+    def _lookup(self, pattern, strict_padding):
+        sequence = fileseq.FileSequence(pattern)
+        directory = os.path.abspath(sequence.dirname() or os.curdir)
+        if directory != self.directory:
+            raise ValueError(
+                "{} is not in indexed directory {}".format(pattern, self.directory)
+            )
+        paddings = self._frames.get((sequence.basename(), sequence.extension()), {})
+        if strict_padding:
+            paddings = {
+                padding: frames
+                for padding, frames in paddings.items()
+                if padding == sequence.zfill()
+            }
+        return sequence, paddings
+
+    def frames(self, pattern, strict_padding=False):
+        """
+        Args:
+            pattern (str): Sequence filepath in the indexed directory, eg,
+                /path/to/file.####.png
+            strict_padding (bool): If True, only frames with the same padding as
+                the pattern are returned
+
+        Raises:
+            ValueError: If the pattern is not in the indexed directory
+            fileseq.FileSeqException: If the frames for the pattern have
+                paddings that can't belong to one sequence
+
+        Returns:
+            list[int]: Sorted frame numbers found for the pattern. Empty if there
+                are none.
+        """
+        _, paddings = self._lookup(pattern, strict_padding)
+        if not paddings:
+            return []
+        paddings = self._single_sequence(pattern, paddings)
+        return sorted(frame for frames in paddings.values() for frame in frames)
+
+    def find_sequence(self, pattern, strict_padding=False):
+        """
+        Equivalent of fileseq.findSequenceOnDisk using the index instead of the disk
+
+        Args:
+            pattern (str): Sequence filepath in the indexed directory, eg,
+                /path/to/file.####.png
+            strict_padding (bool): If True, only frames with the same padding as
+                the pattern are included
+
+        Raises:
+            fileseq.FileSeqException: If no frames exist for the pattern, or they
+                have paddings that can't belong to one sequence
+
+        Returns:
+            fileseq.FileSequence: Sequence containing only the frames on disk,
+                using the padding of the frames on disk
+        """
+        sequence, paddings = self._lookup(pattern, strict_padding)
+        if not paddings:
+            raise fileseq.FileSeqException("no sequence found on disk matching " + pattern)
+        paddings = self._single_sequence(pattern, paddings)
+        return self._make_sequence(sequence.basename(), sequence.extension(), paddings)
+
+    @staticmethod
+    def _split_paddings(paddings):
+        # Unpadded frames have a different number of digits either side of a
+        # power of ten, so frames wider than the smallest padding belong to the
+        # same sequence only if they have no leading zeros, eg, 1000 and 10000
+        # with a padding of 4. Anything else is a separate sequence, eg, 0001
+        # next to 01 and 02.
+        groups = []
+        for padding in sorted(paddings):
+            frames = paddings[padding]
+            unpadded = all(len(str(frame)) == padding for frame in frames)
+            if groups and unpadded:
+                groups[0][padding] = frames
+            else:
+                groups.append({padding: frames})
+        return groups
+
+    def _single_sequence(self, pattern, paddings):
+        groups = self._split_paddings(paddings)
+        if len(groups) > 1:
+            raise fileseq.FileSeqException(
+                "multiple sequences found on disk matching " + pattern
+            )
+        return groups[0]
+
+    def _make_sequence(self, basename, extension, paddings):
+        # The smallest padding is the padding of the whole sequence, see
+        # _split_paddings
+        sequence = fileseq.FileSequence(
+            os.path.join(self.directory, basename + "@" * min(paddings) + extension)
+        )
+        frames = sorted(frame for frames in paddings.values() for frame in frames)
+        sequence.setFrameSet(fileseq.FrameSet(frames))
+        return sequence
+
+    def sequences(self):
+        """
+        Returns:
+            list[fileseq.FileSequence]: Every sequence in the directory, sorted by
+                name
+        """
+        return [
+            self._make_sequence(basename, extension, group)
+            for (basename, extension), paddings in sorted(self._frames.items())
+            for group in self._split_paddings(paddings)
+        ]
@@ -0,0 +1,257 @@
+import errno
+import json
+import os
+import threading
+
+from fileseq_copy import copy_file, hash_file
+
+
+RENAME = "rename"
+
+
+def same_device(source_dir, destination_dir):
+    """
+    Args:
+        source_dir (str): Directory files are being moved from
+        destination_dir (str): Directory files are being moved to
+
+    Returns:
+        bool: True if both directories are on the same device, in which case
+            files can usually be moved between them with a rename. Bind mounts
+            can share a device and still refuse renames, see rename_move.
+    """
+    return os.stat(source_dir).st_dev == os.stat(destination_dir).st_dev
+
+
+def fsync_directory(path):
+    """
+    Flushes a directory's entries to disk, so files renamed into it or created in
+    it survive a power loss.
+
+    Args:
+        path (str): Directory to flush
+    """
+    handle = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(handle)
+    finally:
+        os.close(handle)
+
+
+def copy_move(source, destination, hasher=None, sync=True):
+    """
+    Moves a file to a different device by copying it and removing the original.
+
+    The file is copied to a temporary name next to the destination and renamed
+    into place once complete, so the destination path never contains a partial
+    file, even if the process is killed.
+
+    Args:
+        source (str): File to move
+        destination (str): Path to move it to
+        hasher (hashlib object): If given, the data is added to the hash as it's
+            copied
+        sync (bool): Flush the copy and the destination directory to disk before
+            the source is removed, so a power loss can't lose both. Turning it
+            off is faster, but only safe if the source can be recreated.
+
+    Returns:
+        tuple[int, str]: Number of bytes copied, and the name of the copy method
+    """
+    partial = destination + ".partial"
+    try:
+        result = copy_file(source, partial, hasher=hasher, sync=sync)
+        os.replace(partial, destination)
+    except Exception:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    if sync:
+        fsync_directory(os.path.dirname(os.path.abspath(destination)))
+    os.remove(source)
+    return result
+
+
+def rename_move(source, destination, hasher=None):
+    """
+    Moves a file with a rename, falling back to copy_move if the rename is
+    refused because the paths are on different devices. This happens between
+    bind mounts, which share a device but can't be renamed across.
+
+    Args:
+        source (str): File to move
+        destination (str): Path to move it to
+        hasher (hashlib object): If given, the data is added to the hash. Renamed
+            files are read after they're moved.
+
+    Returns:
+        tuple[int, str]: Number of bytes copied, and the name of the move method
+    """
+    try:
+        os.rename(source, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        return copy_move(source, destination, hasher=hasher)
+    if hasher is not None:
+        hash_file(destination, hasher)
+    return 0, RENAME
+
+
+def get_move_func(source_dir, destination_dir, stats=None, manifest=None):
+    """
+    Checks once which method frames between two directories must be moved with,
+    rather than letting shutil.move work it out again for every frame.
+
+    Args:
+        source_dir (str): Directory files are being moved from
+        destination_dir (str): Directory files are being moved to
+        stats (fileseq_copy.TransferStats): If given, every frame moved is
+            recorded in it along with the method used to move it
+        manifest (fileseq_verify.Manifest): If given, every frame is hashed and
+            recorded in it. Copied frames are hashed while they're being copied,
+            renamed frames have to be read after they're moved.
+
+    Returns:
+        callable: Function taking (source, destination) that moves a single file
+    """
+    move_func = rename_move if same_device(source_dir, destination_dir) else copy_move
+    if stats is None and manifest is None:
+        return move_func
+
+    def move(source, destination):
+        hasher = None if manifest is None else manifest.new_hash()
+        nbytes, method = move_func(source, destination, hasher=hasher)
+        if manifest is not None:
+            manifest.record(destination, hasher.hexdigest())
+        if stats is not None:
+            stats.record(method, nbytes)
+
+    return move
+
+
+class MoveJournal(object):
+    """
+    Append-only record of a sequence move, used to resume or roll back a move
+    that was interrupted part way through.
+
+    The journal is a JSON lines file. The full list of frames is written before
+    anything is moved, then a line is added as each frame completes, and finally
+    a line marking the whole move as finished. Because lines are only ever added,
+    a crash can at worst leave a partially written last line, which is ignored
+    when the journal is read back.
+
+    Args:
+        path (str): Journal file
+    """
+
+    PLAN = "plan"
+    DONE = "done"
+    COMMIT = "commit"
+    ROLLBACK = "rollback"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._handle = None
+
+    def __repr__(self):
+        return "MoveJournal({!r})".format(self.path)
+
+    def _write(self, record, sync=False):
+        with self._lock:
+            if self._handle is None:
+                self._handle = open(self.path, "a")
+            self._handle.write(json.dumps(record) + "\n")
+            self._handle.flush()
+            if sync:
+                os.fsync(self._handle.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def start(self, frame_pairs, manifest_path=None):
+        """
+        Starts a new move. Anything already in the journal, eg, from an earlier
+        move that reused the same path, is discarded, so resume and rollback
+        only ever act on this move.
+
+        Args:
+            frame_pairs (list[tuple[str, str]]): Source and destination of each
+                frame that is about to be moved
+            manifest_path (str): Manifest the moved frames are hashed into, if
+                the move is verified, so a resumed move can keep adding to it
+        """
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+            self._handle = open(self.path, "w")
+        self._write(
+            {"op": self.PLAN, "frames": frame_pairs, "manifest": manifest_path},
+            sync=True,
+        )
+
+    def record(self, source, destination):
+        """Records that a single frame has been moved"""
+        self._write({"op": self.DONE, "src": source, "dst": destination})
+
+    def finish(self, op):
+        """
+        Args:
+            op (str): MoveJournal.COMMIT once every frame has been moved, or
+                MoveJournal.ROLLBACK once every frame has been moved back
+        """
+        self._write({"op": op}, sync=True)
+        self.close()
+
+    def wrap(self, move_func):
+        """
+        Args:
+            move_func (callable): Function taking (source, destination) that
+                moves a single frame
+
+        Returns:
+            callable: Function that calls move_func and records the frame
+        """
+        def journaled_move(source, destination):
+            move_func(source, destination)
+            self.record(source, destination)
+
+        return journaled_move
+
+    def read(self):
+        """
+        Returns:
+            tuple[list[tuple[str, str]], set[str], str, str]: Every (source,
+                destination) pair planned by the latest move, the sources that
+                have been moved, the final state of the journal: COMMIT,
+                ROLLBACK, or None if the move never finished, and the manifest
+                path the move was started with, or None if it wasn't verified
+        """
+        frame_pairs = []
+        done = set()
+        state = None
+        manifest_path = None
+        with open(self.path) as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Only the last line can be incomplete, from a crash mid-write
+                    break
+                if record["op"] == self.PLAN:
+                    # A plan starts a new move, so nothing before it applies
+                    frame_pairs = [tuple(pair) for pair in record["frames"]]
+                    done = set()
+                    state = None
+                    manifest_path = record.get("manifest")
+                elif record["op"] == self.DONE:
+                    done.add(record["src"])
+                else:
+                    state = record["op"]
+        return frame_pairs, done, state, manifest_path
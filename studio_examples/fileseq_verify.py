@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fileseq
+
+from atomic_write import atomic_write
+from fileseq_copy import hash_file
+
+
+# blake2b is considerably faster than sha256 on 64 bit machines
+DEFAULT_ALGORITHM = "blake2b"
+
+MISSING = "missing"
+MISMATCH = "mismatch"
+UNRECORDED = "unrecorded"
+
+
+def get_manifest_path(pattern):
+    """
+    Args:
+        pattern (str): Sequence filepath, eg, /path/to/file.####.png
+
+    Returns:
+        str: Path of the sidecar manifest for the sequence, eg,
+            /path/to/file.png.manifest.json. The extension is kept so sequences
+            that only differ by it, eg, file.#.exr and file.#.png, each have
+            their own manifest.
+    """
+    sequence = fileseq.FileSequence(pattern)
+    return os.path.join(
+        sequence.dirname() or os.curdir,
+        sequence.basename() + sequence.extension().lstrip(".") + ".manifest.json",
+    )
+
+
+class Manifest(object):
+    """
+    Digest of every frame in a sequence, stored in a JSON file alongside it.
+
+    Frames are stored by filename rather than full path, so the manifest stays
+    valid if the sequence and its manifest are moved together. If the manifest
+    file already exists, its digests are loaded so that new frames are added to
+    it rather than replacing it.
+
+    Args:
+        path (str): Manifest JSON file
+        algorithm (str): Name of the hashlib algorithm to hash frames with
+    """
+
+    def __init__(self, path, algorithm=DEFAULT_ALGORITHM):
+        self.path = path
+        self.algorithm = algorithm
+        self.digests = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path) as handle:
+                data = json.load(handle)
+            if data["algorithm"] == algorithm:
+                self.digests = data["frames"]
+
+    def __repr__(self):
+        return "Manifest({!r}, frames={})".format(self.path, len(self.digests))
+
+    def new_hash(self):
+        """
+        Returns:
+            hashlib object: Empty hash using the manifest's algorithm
+        """
+        return hashlib.new(self.algorithm)
+
+    def record(self, path, digest):
+        """
+        Args:
+            path (str): Frame that was hashed
+            digest (str): Hex digest of the frame's data
+        """
+        with self._lock:
+            self.digests[os.path.basename(path)] = digest
+
+    def save(self):
+        """Writes the manifest, replacing the file in a single operation"""
+        with atomic_write(self.path) as handle:
+            json.dump(
+                {"algorithm": self.algorithm, "frames": self.digests},
+                handle,
+                indent=0,
+                sort_keys=True,
+            )
+
+
+def validate_sequence(pattern, workers=4, manifest_path=None):
+    """
+    Checks that every frame recorded in a sequence's manifest still exists and
+    has the same contents, and that every frame of the sequence on disk is
+    recorded in the manifest. Only the frames on disk are read, the digests are
+    taken from the manifest.
+
+    Args:
+        pattern (str): Sequence filepath, eg, /path/to/file.####.png
+        workers (int): Number of frames to hash at the same time. hashlib
+            releases the GIL on large buffers, so threads hash in parallel.
+        manifest_path (str): Manifest to validate against. Defaults to the
+            sequence's sidecar manifest.
+
+    Returns:
+        list[tuple[str, str]]: Path and reason (MISSING, MISMATCH or
+            UNRECORDED) of each frame that failed, sorted by path. Empty if the
+            sequence is valid.
+    """
+    manifest = Manifest(manifest_path or get_manifest_path(pattern))
+    directory = os.path.dirname(os.path.abspath(manifest.path))
+    frames = sorted(manifest.digests.items())
+
+    # Frames on disk with no digest can't be checked, eg, from a move that was
+    # killed before its manifest was saved
+    try:
+        on_disk = fileseq.findSequenceOnDisk(pattern)
+    except fileseq.FileSeqException:
+        on_disk = []
+    unrecorded = [
+        (os.path.abspath(path), UNRECORDED)
+        for path in on_disk
+        if os.path.basename(path) not in manifest.digests
+    ]
+
+    def check(item):
+        filename, digest = item
+        path = os.path.join(directory, filename)
+        hasher = manifest.new_hash()
+        try:
+            hash_file(path, hasher)
+        except FileNotFoundError:
+            return path, MISSING
+        if hasher.hexdigest() != digest:
+            return path, MISMATCH
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        failures = [failure for failure in executor.map(check, frames) if failure]
+    return sorted(failures + unrecorded)
@@ -0,0 +1,116 @@
+"""
+Blurs many sequences in one Nuke session, reusing a single node graph.
+
+The jobs file is a JSON lines file, with one job per line, eg,
+    {"source": "/in/shot010/plate.####.exr", "destination": "/out/shot010/blur.####.exr", "blur": 10, "start": 1001, "end": 1100}
+
+Usage:
+    python nuke_batch.py JOBS [--backend MODULE] [--tile-size N] [--report FILE]
+"""
+import sys
+import time
+
+from batch_cli import new_parser, progress_printer, read_json_lines, write_report
+from nuke_render import add_backend_arguments, get_backend_options, use_backend
+from nuke_template import BlurJob, BlurTemplate
+
+
+def run_batch(jobs, template=None, callback=None):
+    """
+    Renders every job through one graph in the current session. A job that fails
+    doesn't stop the rest.
+
+    Args:
+        jobs (iterable[BlurJob]): Jobs to render
+        template (BlurTemplate): Graph to render with. Defaults to a new one,
+            which is deleted once the batch is done.
+        callback (callable): Called with each job's result as soon as it's done
+
+    Returns:
+        dict: Result of the batch, with keys
+            jobs (list[dict]): Result of each job, in order, with the job's
+                fields plus setup and render seconds and any error
+            build_seconds (float): Seconds taken to build the template
+            elapsed (float): Seconds taken for the whole batch
+    """
+    start_time = time.perf_counter()
+    owns_template = template is None
+    if owns_template:
+        template = BlurTemplate()
+    build_seconds = time.perf_counter() - start_time
+
+    results = []
+    try:
+        for job in jobs:
+            result = dict(job._asdict(), setup=0.0, render=0.0, error=None)
+            job_start = time.perf_counter()
+            try:
+                template.set_job(job)
+                render_start = time.perf_counter()
+                result["setup"] = render_start - job_start
+                template.execute(job.start_frame, job.end_frame)
+                result["render"] = time.perf_counter() - render_start
+            except Exception as error:
+                result["error"] = "{}: {}".format(type(error).__name__, error)
+            results.append(result)
+            if callback is not None:
+                callback(result)
+    finally:
+        if owns_template:
+            template.delete()
+
+    return {
+        "jobs": results,
+        "build_seconds": build_seconds,
+        "elapsed": time.perf_counter() - start_time,
+    }
+
+
+def _parse_job(entry):
+    return BlurJob(
+        entry["source"],
+        entry["destination"],
+        entry["blur"],
+        int(entry["start"]),
+        int(entry["end"]),
+    )
+
+
+def read_jobs(path):
+    """
+    Args:
+        path (str): JSON lines jobs file
+
+    Returns:
+        iterator[BlurJob]: Each job in the file, read one line at a time
+    """
+    return read_json_lines(path, _parse_job, name="job")
+
+
+def main():
+    parser = new_parser(__doc__)
+    parser.add_argument("jobs", help="JSON lines file of jobs to render")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+    use_backend(args.backend, get_backend_options(args))
+
+    result = run_batch(
+        read_jobs(args.jobs),
+        callback=progress_printer(
+            "{source} -> {destination} : setup {setup:.3f}s, "
+            "render {render:.3f}s : {status}"
+        ),
+    )
+    failures = [job for job in result["jobs"] if job["error"]]
+    print(
+        "\nRendered {} jobs ({} failed) in {:.1f}s".format(
+            len(result["jobs"]), len(failures), result["elapsed"]
+        )
+    )
+    write_report(args.report, result)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
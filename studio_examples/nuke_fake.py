@@ -0,0 +1,188 @@
+"""
+Local stand-in for the parts of the nuke module used by the nuke tools, for
+testing them without a Nuke licence.
+
+Nodes are created, connected and executed the same way as in Nuke. Executing a
+Write node "renders" each frame by copying the frame its Read node reads, so the
+output exists and can be checked, but no image processing is done.
+
+Environment variables, so that worker processes can be configured too:
+    NUKE_FAKE_FRAME_SECONDS: Seconds each frame takes to render (default 0)
+    NUKE_FAKE_FAIL_RATE: Chance of each frame failing to render, from 0 to 1
+        (default 0), for testing retries
+"""
+import os
+import random
+import shutil
+import time
+
+from nuke_render import frame_path
+
+
+frame_seconds = float(os.environ.get("NUKE_FAKE_FRAME_SECONDS", 0))
+fail_rate = float(os.environ.get("NUKE_FAKE_FAIL_RATE", 0))
+
+# Counts of what this process has done, for tests and benchmarks
+stats = {"created": 0, "deleted": 0, "executed": 0, "frames": 0}
+
+_nodes = []
+_selected = None
+
+
+class Knob(object):
+    def __init__(self, name, value=None):
+        self._name = name
+        self._value = value
+
+    def __repr__(self):
+        return "Knob({!r}, {!r})".format(self._name, self._value)
+
+    def name(self):
+        return self._name
+
+    def value(self):
+        return self._value
+
+    def getValue(self):
+        return self._value
+
+    def setValue(self, value):
+        self._value = value
+        return True
+
+
+# Knobs each node class has, with their default values
+NODE_KNOBS = {
+    "Read": {"file": "", "first": 1, "last": 1},
+    "Blur": {"size": 0.0, "channels": "rgba"},
+    "Write": {"file": "", "file_type": ""},
+}
+
+
+class Node(object):
+    def __init__(self, node_class, name):
+        self._class = node_class
+        self._knobs = {
+            knob_name: Knob(knob_name, value)
+            for knob_name, value in NODE_KNOBS.get(node_class, {}).items()
+        }
+        self._knobs["name"] = Knob("name", name)
+        self._inputs = {}
+
+    def __repr__(self):
+        return "<{} {}>".format(self._class, self.name())
+
+    def __getitem__(self, name):
+        try:
+            return self._knobs[name]
+        except KeyError:
+            raise NameError("{} has no knob named {}".format(self.name(), name))
+
+    def Class(self):
+        return self._class
+
+    def name(self):
+        return self._knobs["name"].value()
+
+    def knobs(self):
+        return dict(self._knobs)
+
+    def setInput(self, index, node):
+        if node is None:
+            self._inputs.pop(index, None)
+        else:
+            self._inputs[index] = node
+        return True
+
+    def input(self, index):
+        return self._inputs.get(index)
+
+
+def createNode(node_class, args="", inpanel=True):
+    """
+    Creates a node connected to the selected node, which is usually the last one
+    created, the same as Nuke does.
+    """
+    global _selected
+    count = sum(1 for node in _nodes if node.Class() == node_class)
+    node = Node(node_class, "{}{}".format(node_class, count + 1))
+    if _selected is not None and node_class != "Read":
+        node.setInput(0, _selected)
+    _nodes.append(node)
+    _selected = node
+    stats["created"] += 1
+    return node
+
+
+def allNodes(filter=None):
+    return [node for node in _nodes if filter is None or node.Class() == filter]
+
+
+def toNode(name):
+    for node in _nodes:
+        if node.name() == name:
+            return node
+    return None
+
+
+def delete(node):
+    global _selected
+    _nodes.remove(node)
+    for other in _nodes:
+        for index, input_node in list(other._inputs.items()):
+            if input_node is node:
+                other.setInput(index, None)
+    if _selected is node:
+        _selected = None
+    stats["deleted"] += 1
+
+
+def scriptClear():
+    for node in list(_nodes):
+        delete(node)
+
+
+def _upstream_read(node):
+    while node is not None and node.Class() != "Read":
+        node = node.input(0)
+    return node
+
+
+def execute(node, start, end, incr=1):
+    """
+    Renders the frames of a Write node by copying the frames read by the Read
+    node upstream of it.
+
+    Raises:
+        RuntimeError: If the node isn't a Write connected to a Read, or a frame
+            can't be read or rendered, the same way Nuke reports render errors
+    """
+    if isinstance(node, str):
+        node = toNode(node)
+    if node is None or node.Class() != "Write":
+        raise RuntimeError("execute requires a Write node")
+    read_node = _upstream_read(node.input(0))
+    if read_node is None:
+        raise RuntimeError("{}: has no Read node connected".format(node.name()))
+
+    stats["executed"] += 1
+    for frame in range(int(start), int(end) + 1, incr):
+        source = frame_path(read_node["file"].value(), frame)
+        destination = frame_path(node["file"].value(), frame)
+        if not os.path.exists(source):
+            raise RuntimeError(
+                "{}: Read error: {}: No such file or directory".format(
+                    read_node.name(), source
+                )
+            )
+        if frame_seconds:
+            time.sleep(frame_seconds)
+        if fail_rate and random.random() < fail_rate:
+            raise RuntimeError(
+                "{}: render failed on frame {}".format(node.name(), frame)
+            )
+        directory = os.path.dirname(destination)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        shutil.copyfile(source, destination)
+        stats["frames"] += 1
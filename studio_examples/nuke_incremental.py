@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+
+from atomic_write import atomic_write
+from nuke_render import FRAME_PATTERN, RenderError, frame_path
+from nuke_template import BlurJob, BlurTemplate
+
+
+STATE_VERSION = 1
+
+
+def get_state_path(destination):
+    """
+    Args:
+        destination (str): Output file path, using Nuke's frame padding, eg,
+            /path/to/blur.####.exr
+
+    Returns:
+        str: Path of the sidecar render state for the output, eg,
+            /path/to/blur.render_state.json
+    """
+    match = FRAME_PATTERN.search(destination)
+    prefix = destination[:match.start()] if match else destination + "."
+    return prefix + "render_state.json"
+
+
+def fingerprint_file(path, use_hash=False):
+    """
+    Args:
+        path (str): File to fingerprint
+        use_hash (bool): If True, the file's contents are hashed, which is slow
+            but catches changes that keep the size and modification time, eg,
+            files copied with their times preserved
+
+    Returns:
+        str: Value that changes whenever the file does, or None if it's missing
+    """
+    try:
+        if use_hash:
+            hasher = hashlib.blake2b()
+            with open(path, "rb") as handle:
+                for block in iter(lambda: handle.read(1024 * 1024), b""):
+                    hasher.update(block)
+            return hasher.hexdigest()
+        stat = os.stat(path)
+    except (IOError, OSError):
+        return None
+    return "{}:{}".format(stat.st_size, stat.st_mtime_ns)
+
+
+def params_digest(**params):
+    """
+    Args:
+        **params: Node parameters used to render, eg, size=10
+
+    Returns:
+        str: Digest that changes if any of the parameters change
+    """
+    data = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def frame_ranges(frames):
+    """
+    Args:
+        frames (list[int]): Frame numbers
+
+    Returns:
+        list[tuple[int, int]]: Inclusive (start, end) of each run of consecutive
+            frames, eg, [1, 2, 3, 7, 8] gives [(1, 3), (7, 8)]
+    """
+    ranges = []
+    for frame in sorted(set(frames)):
+        if ranges and ranges[-1][1] == frame - 1:
+            ranges[-1] = (ranges[-1][0], frame)
+        else:
+            ranges.append((frame, frame))
+    return ranges
+
+
+class RenderState(object):
+    """
+    Records what each output frame was rendered from: a fingerprint of its source
+    frame and a digest of the node parameters. A frame is stale if its output is
+    missing or either of these has changed since it was rendered.
+
+    Args:
+        path (str): JSON file the state is stored in. Loaded if it exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._frames = {}
+        try:
+            with open(path) as handle:
+                data = json.load(handle)
+        except (IOError, OSError, ValueError):
+            data = None
+        if data is not None and data.get("version") == STATE_VERSION:
+            self._frames = {
+                int(frame): tuple(record) for frame, record in data["frames"].items()
+            }
+
+    def __repr__(self):
+        return "RenderState({!r}, frames={})".format(self.path, len(self._frames))
+
+    def stale_frames(self, source, destination, frames, params, use_hash=False):
+        """
+        Args:
+            source (str): Source file path, using Nuke's frame padding
+            destination (str): Output file path, using Nuke's frame padding
+            frames (iterable[int]): Frames to check
+            params (str): Digest of the node parameters, from params_digest
+            use_hash (bool): Fingerprint source frames by hashing their contents
+
+        Returns:
+            tuple[list[int], dict[int, str]]: Frames that need rendering, and the
+                fingerprint of the source of each, to pass to record once
+                they're rendered
+        """
+        stale = []
+        fingerprints = {}
+        for frame in frames:
+            fingerprint = fingerprint_file(frame_path(source, frame), use_hash)
+            record = self._frames.get(frame)
+            if (
+                fingerprint is None
+                or record != (fingerprint, params)
+                or not os.path.exists(frame_path(destination, frame))
+            ):
+                stale.append(frame)
+                fingerprints[frame] = fingerprint
+        return stale, fingerprints
+
+    def record(self, fingerprints, params):
+        """
+        Args:
+            fingerprints (dict[int, str]): Source fingerprint of each frame that
+                was rendered
+            params (str): Digest of the node parameters they were rendered with
+        """
+        for frame, fingerprint in fingerprints.items():
+            if fingerprint is not None:
+                self._frames[frame] = (fingerprint, params)
+
+    def save(self):
+        """
+        Writes the state to disk. The file is replaced in a single operation so
+        that an interrupted save never leaves a corrupt state.
+        """
+        data = {
+            "version": STATE_VERSION,
+            "frames": {
+                str(frame): list(record) for frame, record in self._frames.items()
+            },
+        }
+        with atomic_write(self.path) as handle:
+            json.dump(data, handle)
+
+
+def blur_input_incremental(
+    source,
+    destination,
+    blur_value,
+    start_frame,
+    end_frame,
+    state_path=None,
+    use_hash=False,
+    render=None,
+):
+    """
+    The same as nuke_example.blur_input, but only renders the frames that are
+    stale: frames whose output is missing, whose source frame has changed, or
+    that were rendered with different parameters. Re-running with a tweaked
+    source on a few frames only re-renders those frames.
+
+    Consecutive stale frames are rendered together, with one render call for
+    each run of frames.
+
+    Args:
+        source (str): Source file path, using Nuke's frame padding
+        destination (str): Output file path, using Nuke's frame padding
+        blur_value (float): Blur size
+        start_frame (int): First frame
+        end_frame (int): Last frame, inclusive
+        state_path (str): Render state file. Defaults to a file next to the
+            output, see get_state_path.
+        use_hash (bool): Fingerprint source frames by hashing their contents
+            rather than using their size and modification time. Changing this
+            makes every frame stale once, as the fingerprints no longer match.
+        render (callable): Called with (source, destination, blur_value, start,
+            end) to render each run of stale frames. Defaults to rendering in
+            this session with one nuke_template.BlurTemplate, which is deleted
+            afterwards. nuke_render.render_blur can be used to render across
+            processes, eg, functools.partial(render_blur, workers=8)
+
+    Returns:
+        list[int]: Frames that were rendered
+    """
+    destination_dir = os.path.dirname(destination)
+    if destination_dir and not os.path.isdir(destination_dir):
+        os.makedirs(destination_dir)
+    state = RenderState(state_path or get_state_path(destination))
+    # The source path is included, so pointing at a different plate re-renders
+    params = params_digest(source=source, size=blur_value)
+    stale, fingerprints = state.stale_frames(
+        source, destination, range(start_frame, end_frame + 1), params, use_hash
+    )
+
+    # Every run of stale frames is rendered through the same graph, rather than
+    # creating three new nodes for each
+    template = None
+    if render is None and stale:
+        template = BlurTemplate()
+
+        def render(source, destination, blur_value, start, end):
+            template.render(BlurJob(source, destination, blur_value, start, end))
+
+    rendered = []
+    try:
+        for start, end in frame_ranges(stale):
+            try:
+                render(source, destination, blur_value, start, end)
+            except RenderError as error:
+                # Chunks that did render are recorded before failing
+                for chunk in error.result["chunks"]:
+                    if chunk["error"] is None:
+                        rendered.extend(range(chunk["start"], chunk["end"] + 1))
+                raise
+            rendered.extend(range(start, end + 1))
+    finally:
+        state.record({frame: fingerprints[frame] for frame in rendered}, params)
+        state.save()
+        if template is not None:
+            template.delete()
+    return rendered
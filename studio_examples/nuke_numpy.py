@@ -0,0 +1,411 @@
+"""
+Headless backend for the nuke tools that blurs frames with NumPy, so that
+proxies can be made on any machine without a Nuke licence.
+
+It replaces the nuke module the same way nuke_fake does, so nuke_example's
+blur_input and nuke_render's render_blur work unchanged, eg,
+
+    render_blur(source, destination, 10, 1001, 3000, backend="nuke_numpy")
+
+renders the frames across a process pool with NumPy doing the blur.
+
+Frames are read and written as binary PGM/PPM (8 or 16 bit) or NumPy .npy
+files. Other formats, eg, EXR, are read and written with imageio if it's
+installed.
+
+Frames are processed in tiles rather than loaded whole if a tile size is given
+with configure, which render_blur's backend_options does in every worker, eg,
+
+    render_blur(source, destination, 10, 1001, 3000, backend="nuke_numpy",
+                backend_options={"tile_size": 1024})
+"""
+import math
+import os
+
+import numpy as np
+
+# The node graph is the same as the stand-in's, only execute is different
+from nuke_fake import (
+    Knob,
+    Node,
+    allNodes,
+    createNode,
+    delete,
+    scriptClear,
+    stats,
+    toNode,
+)
+from nuke_render import frame_path
+
+
+# Nuke's Blur size is the width of the filter in pixels. The Gaussian used here
+# has a standard deviation of size * SIGMA_PER_SIZE, so size covers +/-3 sigma,
+# which is close enough to Nuke's result for proxies.
+SIGMA_PER_SIZE = 1.0 / 6.0
+
+NETPBM_EXTENSIONS = (".pgm", ".ppm", ".pnm")
+# Formats whose pixels are stored uncompressed, so they can be memory-mapped
+MAPPABLE_EXTENSIONS = NETPBM_EXTENSIONS + (".npy",)
+
+# Set by configure. 0 loads whole frames.
+tile_size = 0
+
+
+def configure(tile_size=0):
+    """
+    Sets how this process renders. Called by nuke_render.use_backend with the
+    backend options, so that worker processes are configured the same way.
+
+    Args:
+        tile_size (int): If greater than 0, frames are processed in tiles of
+            this many pixels square, memory-mapping the source and output files
+            rather than loading whole frames. See blur_file_tiled. Only PGM/PPM
+            and .npy frames can be memory-mapped.
+    """
+    globals()["tile_size"] = int(tile_size)
+
+
+def gaussian_kernel(size):
+    """
+    Args:
+        size (float): Blur size, as on Nuke's Blur node
+
+    Returns:
+        numpy.ndarray: Normalised 1D float32 weights, of odd length. A single
+            weight of 1 if size is too small to blur.
+    """
+    sigma = size * SIGMA_PER_SIZE
+    radius = int(math.ceil(size / 2.0))
+    if sigma <= 0 or radius < 1:
+        return np.ones(1, dtype=np.float32)
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    weights = np.exp(-(offsets ** 2) / (2.0 * sigma * sigma))
+    return (weights / weights.sum()).astype(np.float32)
+
+
+def _blur_axis(image, kernel, axis):
+    # Sums shifted copies of the image, one per kernel weight. Each step is a
+    # single vectorised operation over the whole image, so the cost is a few
+    # passes per weight rather than Python code per pixel. Pixels beyond the
+    # edge repeat the edge pixel, the same as Nuke's Read node by default.
+    radius = len(kernel) // 2
+    if radius == 0:
+        return image
+    pad = [(0, 0)] * image.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(image, pad, mode="edge")
+    length = image.shape[axis]
+    result = np.zeros(image.shape, dtype=np.float32)
+    for offset, weight in enumerate(kernel):
+        window = [slice(None)] * image.ndim
+        window[axis] = slice(offset, offset + length)
+        result += weight * padded[tuple(window)]
+    return result
+
+
+def blur_image(image, size):
+    """
+    Blurs an image with a separable Gaussian: once horizontally, then once
+    vertically, which gives the same result as a 2D Gaussian at a fraction of
+    the cost.
+
+    Args:
+        image (numpy.ndarray): Image of shape (height, width) or
+            (height, width, channels)
+        size (float|tuple[float, float]): Blur size, or separate (width,
+            height) sizes, as on Nuke's Blur node
+
+    Returns:
+        numpy.ndarray: Blurred image, with the same shape and dtype as image
+    """
+    return blur_image_sizes(image, [size])
+
+
+def blur_image_sizes(image, sizes):
+    """
+    Applies several blurs in turn, eg, for a chain of Blur nodes. The image is
+    only converted back to its dtype at the end, so the result isn't rounded
+    between blurs.
+
+    Args:
+        image (numpy.ndarray): Image of shape (height, width) or
+            (height, width, channels)
+        sizes (list[float|tuple[float, float]]): Size of each blur, in order
+
+    Returns:
+        numpy.ndarray: Blurred image, with the same shape and dtype as image
+    """
+    kernels = [_kernels(size) for size in sizes]
+    return _to_dtype(_apply_kernels(image.astype(np.float32), kernels), image.dtype)
+
+
+def _kernels(size):
+    size_x, size_y = size if isinstance(size, (tuple, list)) else (size, size)
+    return gaussian_kernel(size_x), gaussian_kernel(size_y)
+
+
+def _apply_kernels(image, kernels):
+    for kernel_x, kernel_y in kernels:
+        image = _blur_axis(image, kernel_x, axis=1)
+        image = _blur_axis(image, kernel_y, axis=0)
+    return image
+
+
+def _to_dtype(image, dtype):
+    if np.issubdtype(dtype, np.integer):
+        limits = np.iinfo(dtype)
+        return np.clip(np.rint(image), limits.min, limits.max).astype(dtype)
+    return image.astype(dtype)
+
+
+def _read_netpbm_header(handle):
+    # Returns (magic, width, height, maxval) and leaves the file at the start of
+    # the pixel data. Header values are separated by whitespace, and "#" starts
+    # a comment that runs to the end of the line.
+    values = []
+    while len(values) < 4:
+        line = handle.readline()
+        if not line:
+            raise ValueError("{}: truncated header".format(handle.name))
+        values.extend(line.split(b"#")[0].split())
+    magic, width, height, maxval = values[:4]
+    if magic not in (b"P5", b"P6"):
+        raise ValueError("{}: only binary PGM/PPM is supported".format(handle.name))
+    return magic, int(width), int(height), int(maxval)
+
+
+def netpbm_layout(path):
+    """
+    Args:
+        path (str): Binary PGM/PPM file
+
+    Returns:
+        tuple: (offset, shape, dtype) of the pixel data in the file, so it can be
+            read directly or memory-mapped
+    """
+    with open(path, "rb") as handle:
+        magic, width, height, maxval = _read_netpbm_header(handle)
+        offset = handle.tell()
+    # 16 bit values are stored most significant byte first
+    dtype = np.dtype(">u2") if maxval > 255 else np.dtype(np.uint8)
+    shape = (height, width, 3) if magic == b"P6" else (height, width)
+    return offset, shape, dtype
+
+
+def read_image(path):
+    """
+    Args:
+        path (str): Image file
+
+    Returns:
+        numpy.ndarray: Pixels, of shape (height, width) or
+            (height, width, channels)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path)
+    if extension in NETPBM_EXTENSIONS:
+        offset, shape, dtype = netpbm_layout(path)
+        with open(path, "rb") as handle:
+            handle.seek(offset)
+            data = np.fromfile(handle, dtype=dtype, count=int(np.prod(shape)))
+        return data.reshape(shape).astype(dtype.newbyteorder("="))
+    return _imageio().imread(path)
+
+
+def write_netpbm_header(handle, shape, dtype):
+    """
+    Args:
+        handle (file): Binary file to write to
+        shape (tuple): Image shape, (height, width) for PGM, or
+            (height, width, 3) for PPM
+        dtype (numpy.dtype): uint8 or uint16
+    """
+    magic = b"P6" if len(shape) == 3 else b"P5"
+    maxval = 65535 if np.dtype(dtype).itemsize == 2 else 255
+    handle.write(b"%s\n%d %d\n%d\n" % (magic, shape[1], shape[0], maxval))
+
+
+def write_image(path, image):
+    """
+    Args:
+        path (str): Image file to write. The format is taken from the extension.
+        image (numpy.ndarray): Pixels, of shape (height, width) or
+            (height, width, channels)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        np.save(path, image)
+    elif extension in NETPBM_EXTENSIONS:
+        if image.dtype not in (np.uint8, np.uint16):
+            raise ValueError("PGM/PPM can only store 8 or 16 bit images")
+        with open(path, "wb") as handle:
+            write_netpbm_header(handle, image.shape, image.dtype)
+            handle.write(image.astype(image.dtype.newbyteorder(">")).tobytes())
+    else:
+        _imageio().imwrite(path, image)
+
+
+def map_image(path):
+    """
+    Args:
+        path (str): Binary PGM/PPM or .npy file
+
+    Returns:
+        numpy.ndarray: Read-only memory-mapped pixels. Only the parts that are
+            used are read from disk.
+    """
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    offset, shape, dtype = netpbm_layout(path)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def create_image(path, shape, dtype):
+    """
+    Args:
+        path (str): Binary PGM/PPM or .npy file to create
+        shape (tuple): Image shape
+        dtype (numpy.dtype): Pixel type
+
+    Returns:
+        numpy.ndarray: Writable memory-mapped pixels of the new file
+    """
+    if path.lower().endswith(".npy"):
+        return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    dtype = np.dtype(dtype).newbyteorder("=")
+    if dtype not in (np.uint8, np.uint16):
+        raise ValueError("PGM/PPM can only store 8 or 16 bit images")
+    with open(path, "wb") as handle:
+        write_netpbm_header(handle, shape, dtype)
+        offset = handle.tell()
+        handle.truncate(offset + int(np.prod(shape)) * dtype.itemsize)
+    return np.memmap(
+        path, dtype=dtype.newbyteorder(">"), mode="r+", offset=offset, shape=shape
+    )
+
+
+def blur_file_tiled(source, destination, sizes, tile_size=1024):
+    """
+    Blurs a frame one tile at a time, so that the memory used depends on the
+    tile size rather than the frame size. The source and output are
+    memory-mapped, so each tile is read straight from the source file and
+    written straight to the output. Mapped pages are file cache that the system
+    can reclaim when memory is short, unlike the memory a whole frame is loaded
+    into.
+
+    Each tile is blurred with a border of extra pixels around it (the halo),
+    as wide as the blur reaches, so the result is identical to blurring the
+    whole frame at once.
+
+    Args:
+        source (str): Binary PGM/PPM or .npy source frame
+        destination (str): Output frame, in any of the same formats
+        sizes (list[float|tuple[float, float]]): Size of each blur to apply,
+            in order
+        tile_size (int): Width and height of each tile, in pixels
+    """
+    image = map_image(source)
+    dtype = image.dtype.newbyteorder("=")
+    output = create_image(destination, image.shape, dtype)
+    kernels = [_kernels(size) for size in sizes]
+    halo_x = sum(len(kernel_x) // 2 for kernel_x, _ in kernels)
+    halo_y = sum(len(kernel_y) // 2 for _, kernel_y in kernels)
+    height, width = image.shape[:2]
+
+    for top in range(0, height, tile_size):
+        bottom = min(top + tile_size, height)
+        read_top, read_bottom = max(0, top - halo_y), min(height, bottom + halo_y)
+        for left in range(0, width, tile_size):
+            right = min(left + tile_size, width)
+            read_left, read_right = max(0, left - halo_x), min(width, right + halo_x)
+            tile = np.asarray(
+                image[read_top:read_bottom, read_left:read_right], dtype=np.float32
+            )
+            # Halo pixels outside the frame are filled by repeating the edge,
+            # the same as when the whole frame is blurred
+            tile = _apply_kernels(tile, kernels)
+            core = tile[
+                top - read_top:bottom - read_top, left - read_left:right - read_left
+            ]
+            output[top:bottom, left:right] = _to_dtype(core, dtype)
+        # Written back a row of tiles at a time, so modified pages don't build
+        # up in memory
+        output.flush()
+    del output
+
+
+def _imageio():
+    try:
+        import imageio
+    except ImportError:
+        raise ValueError(
+            "Only .pgm, .ppm and .npy frames are supported without imageio"
+        )
+    return imageio
+
+
+def _graph(write_node):
+    # Returns the Read node upstream of the Write and the Blur nodes between
+    # them, in the order they're applied
+    blurs = []
+    node = write_node.input(0)
+    while node is not None and node.Class() != "Read":
+        if node.Class() != "Blur":
+            raise NotImplementedError(
+                "nuke_numpy can't render {} nodes".format(node.Class())
+            )
+        blurs.insert(0, node)
+        node = node.input(0)
+    if node is None:
+        raise RuntimeError("{}: has no Read node connected".format(write_node.name()))
+    return node, blurs
+
+
+def execute(node, start, end, incr=1):
+    """
+    Renders the frames of a Write node, applying each Blur between it and its
+    Read node with NumPy.
+
+    Raises:
+        RuntimeError: If the node isn't a Write connected to a Read, a frame
+            can't be read, or a tile size is configured for frames that can't
+            be memory-mapped, the same way Nuke reports render errors
+    """
+    if isinstance(node, str):
+        node = toNode(node)
+    if node is None or node.Class() != "Write":
+        raise RuntimeError("execute requires a Write node")
+    read_node, blurs = _graph(node)
+
+    sizes = [blur_node["size"].value() for blur_node in blurs]
+    tiled = tile_size > 0
+    if tiled:
+        # Falling back to loading whole frames could run out of memory on the
+        # large frames tiling is meant for, so it's an error instead
+        for path in (read_node["file"].value(), node["file"].value()):
+            if os.path.splitext(path)[1].lower() not in MAPPABLE_EXTENSIONS:
+                raise RuntimeError(
+                    "{}: can't render {} in tiles, only {} files can be "
+                    "memory-mapped".format(
+                        node.name(), path, ", ".join(MAPPABLE_EXTENSIONS)
+                    )
+                )
+
+    stats["executed"] += 1
+    for frame in range(int(start), int(end) + 1, incr):
+        source = frame_path(read_node["file"].value(), frame)
+        destination = frame_path(node["file"].value(), frame)
+        directory = os.path.dirname(destination)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        try:
+            if tiled:
+                blur_file_tiled(source, destination, sizes, tile_size)
+            else:
+                write_image(destination, blur_image_sizes(read_image(source), sizes))
+        except (IOError, OSError) as error:
+            raise RuntimeError(
+                "{}: Read error: {}: {}".format(read_node.name(), source, error)
+            )
+        stats["frames"] += 1
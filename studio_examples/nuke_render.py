@@ -0,0 +1,354 @@
+"""
+Renders a blur_input frame range in chunks across worker processes.
+
+Usage:
+    python nuke_render.py SOURCE DESTINATION BLUR START END [--workers N]
+        [--chunk-size N] [--retries N] [--backend MODULE] [--tile-size N]
+        [--report FILE]
+
+eg, to test without a Nuke licence using the nuke_fake stand-in:
+    python nuke_render.py /in/plate.####.exr /out/blur.####.exr 10 1 2000 \\
+        --backend nuke_fake
+"""
+import importlib
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from batch_cli import new_parser, progress_printer, write_report
+from nuke_template import BlurJob, BlurTemplate
+
+
+# Nuke's frame padding, either "####" or printf style, eg, "%04d"
+FRAME_PATTERN = re.compile(r"%0?(\d*)d|#+")
+
+
+class RenderError(Exception):
+    """
+    Raised when chunks still fail after every retry.
+
+    Attributes:
+        result (dict): Result of the whole render, as returned by render_blur
+    """
+
+    def __init__(self, result):
+        failed = result["failed"]
+        super(RenderError, self).__init__(
+            "{} of {} chunks failed to render, first error: {}".format(
+                len(failed), len(result["chunks"]), failed[0]["error"]
+            )
+        )
+        self.result = result
+
+
+def frame_path(path, frame):
+    """
+    Args:
+        path (str): File path using Nuke's frame padding, eg, "/tmp/a.####.exr"
+            or "/tmp/a.%04d.exr"
+        frame (int): Frame number
+
+    Returns:
+        str: Path of the frame, eg, "/tmp/a.0001.exr"
+    """
+
+    def replace(match):
+        if match.group(0).startswith("#"):
+            width = len(match.group(0))
+        else:
+            width = int(match.group(1) or 0)
+        return "{:0{}d}".format(frame, width)
+
+    return FRAME_PATTERN.sub(replace, path)
+
+
+def split_frames(start_frame, end_frame, chunk_size):
+    """
+    Args:
+        start_frame (int): First frame
+        end_frame (int): Last frame, inclusive
+        chunk_size (int): Maximum frames per chunk
+
+    Returns:
+        list[tuple[int, int]]: Inclusive (start, end) frames of each chunk
+    """
+    return [
+        (start, min(start + chunk_size - 1, end_frame))
+        for start in range(start_frame, end_frame + 1, chunk_size)
+    ]
+
+
+def use_backend(backend, options=None):
+    """
+    Makes "import nuke" in this process import the backend module instead, eg,
+    nuke_fake. Used as the initializer of worker processes.
+
+    Args:
+        backend (str): Name of the module to use as nuke
+        options (dict): Passed to the backend's configure function, eg,
+            {"tile_size": 1024} for nuke_numpy
+
+    Raises:
+        ValueError: If options are given for a backend that has no configure
+    """
+    if backend != "nuke":
+        sys.modules["nuke"] = importlib.import_module(backend)
+    if options:
+        _get_configure(backend)(**options)
+
+
+def _get_configure(backend):
+    configure = getattr(importlib.import_module(backend), "configure", None)
+    if configure is None:
+        raise ValueError("{} doesn't take any options".format(backend))
+    return configure
+
+
+# Graph of the current worker process, see render_chunk
+_template = None
+
+
+def render_chunk(source, destination, blur_value, start_frame, end_frame):
+    """
+    Renders one chunk with the same Read -> Blur -> Write graph as blur_input.
+    Runs in a worker process, which builds its own graph for its first chunk
+    and re-parameterises it for every chunk after that.
+
+    Returns:
+        dict: pid of the worker and seconds taken to render
+    """
+    global _template
+    start = time.perf_counter()
+    if _template is None:
+        _template = BlurTemplate()
+    _template.render(BlurJob(source, destination, blur_value, start_frame, end_frame))
+    return {"pid": os.getpid(), "seconds": time.perf_counter() - start}
+
+
+def render_blur(
+    source,
+    destination,
+    blur_value,
+    start_frame,
+    end_frame,
+    workers=None,
+    chunk_size=None,
+    retries=2,
+    backend="nuke",
+    backend_options=None,
+    callback=None,
+):
+    """
+    The same as nuke_example.blur_input, but the frame range is split into chunks
+    rendered in parallel by a pool of worker processes, so that a long range uses
+    every core. Each worker needs its own Nuke licence.
+
+    A chunk that fails is submitted again, up to retries times, as render errors
+    are often temporary, eg, a file server being slow. Chunks that succeed aren't
+    rendered again. If a worker process dies, eg, Nuke crashing, the pool is
+    replaced and every chunk that was still rendering counts as a failed attempt.
+
+    Args:
+        source (str): Source file path, using Nuke's frame padding
+        destination (str): Output file path, using Nuke's frame padding
+        blur_value (float): Blur size
+        start_frame (int): First frame
+        end_frame (int): Last frame, inclusive
+        workers (int): Number of processes. Defaults to the number of cores.
+        chunk_size (int): Frames per chunk. Defaults to a size giving each
+            worker about 4 chunks, so that workers finishing early can pick up
+            more of the remaining work.
+        retries (int): Number of times to retry a failed chunk
+        backend (str): Module the workers use as nuke, eg, "nuke_fake" to test
+            without a licence
+        backend_options (dict): Options every worker configures the backend
+            with, see use_backend
+        callback (callable): Called with each chunk's result once it succeeds or
+            has used up its retries
+
+    Raises:
+        RenderError: If any chunk fails after every retry. The error's result
+            contains the chunks that succeeded.
+        ValueError: If backend_options are given for a backend without options
+
+    Returns:
+        dict: Result of the render, with keys
+            chunks (list[dict]): Result of each chunk, ordered by frame
+            failed (list[dict]): Chunks that failed after every retry
+            frames (int): Number of frames rendered
+            elapsed (float): Seconds taken for the whole render
+            frames_per_second (float): Frames rendered per second
+    """
+    if backend_options:
+        # Checked here as well, as an error in a worker's initializer only
+        # shows up as a broken pool
+        _get_configure(backend)
+    workers = workers or multiprocessing.cpu_count()
+    frame_count = end_frame - start_frame + 1
+    if chunk_size is None:
+        chunk_size = max(1, int(math.ceil(frame_count / float(workers * 4))))
+    chunks = [
+        {
+            "start": start,
+            "end": end,
+            "frames": end - start + 1,
+            "attempts": 0,
+            "seconds": 0.0,
+            "pid": None,
+            "error": None,
+        }
+        for start, end in split_frames(start_frame, end_frame, chunk_size)
+    ]
+
+    def new_executor():
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=use_backend,
+            initargs=(backend, backend_options),
+        )
+
+    def submit(chunk):
+        nonlocal executor
+        chunk["attempts"] += 1
+        args = (source, destination, blur_value, chunk["start"], chunk["end"])
+        try:
+            future = executor.submit(render_chunk, *args)
+        except BrokenProcessPool:
+            executor.shutdown()
+            executor = new_executor()
+            future = executor.submit(render_chunk, *args)
+        pending[future] = chunk
+
+    start_time = time.perf_counter()
+    executor = new_executor()
+    pending = {}
+    try:
+        for chunk in chunks:
+            submit(chunk)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            if any(isinstance(f.exception(), BrokenProcessPool) for f in done):
+                # A worker died, which fails every future of the pool, so they're
+                # all collected before the pool is replaced
+                done = wait(pending).done
+                executor.shutdown()
+                executor = new_executor()
+            retry = []
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    chunk.update(future.result(), error=None)
+                except Exception as error:
+                    chunk["error"] = "{}: {}".format(type(error).__name__, error)
+                    if chunk["attempts"] <= retries:
+                        retry.append(chunk)
+                        continue
+                if callback is not None:
+                    callback(chunk)
+            for chunk in retry:
+                submit(chunk)
+    finally:
+        executor.shutdown()
+
+    elapsed = time.perf_counter() - start_time
+    failed = [chunk for chunk in chunks if chunk["error"] is not None]
+    frames = sum(chunk["frames"] for chunk in chunks if chunk["error"] is None)
+    result = {
+        "chunks": chunks,
+        "failed": failed,
+        "frames": frames,
+        "elapsed": elapsed,
+        "frames_per_second": frames / elapsed if elapsed else 0.0,
+    }
+    if failed:
+        raise RenderError(result)
+    return result
+
+
+def add_backend_arguments(parser):
+    """
+    Args:
+        parser (argparse.ArgumentParser): Parser to add the --backend and
+            --tile-size arguments to, see get_backend_options
+    """
+    parser.add_argument(
+        "--backend", default="nuke", help="Module to use as nuke (default: nuke)"
+    )
+    parser.add_argument(
+        "--tile-size",
+        type=int,
+        help="Render frames in tiles of this many pixels (nuke_numpy only)",
+    )
+
+
+def get_backend_options(args):
+    """
+    Args:
+        args (argparse.Namespace): Arguments parsed with add_backend_arguments
+
+    Returns:
+        dict: Options to configure the backend with, or None if there are none
+    """
+    return {"tile_size": args.tile_size} if args.tile_size else None
+
+
+def main():
+    parser = new_parser(__doc__)
+    parser.add_argument("source", help="Source path, eg, /in/plate.####.exr")
+    parser.add_argument("destination", help="Output path, eg, /out/blur.####.exr")
+    parser.add_argument("blur", type=float, help="Blur size")
+    parser.add_argument("start", type=int, help="First frame")
+    parser.add_argument("end", type=int, help="Last frame")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes (default: number of cores)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=None, help="Frames per chunk")
+    parser.add_argument(
+        "--retries", type=int, default=2, help="Retries per chunk (default: 2)"
+    )
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        result = render_blur(
+            args.source,
+            args.destination,
+            args.blur,
+            args.start,
+            args.end,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            retries=args.retries,
+            backend=args.backend,
+            backend_options=get_backend_options(args),
+            callback=progress_printer(
+                "frames {start}-{end} : {attempts} attempts : {seconds:.1f}s : {status}"
+            ),
+        )
+    except RenderError as error:
+        result = error.result
+        print(error)
+
+    print(
+        "\nRendered {} frames in {:.1f}s ({:.1f} frames/s), {} chunks failed".format(
+            result["frames"],
+            result["elapsed"],
+            result["frames_per_second"],
+            len(result["failed"]),
+        )
+    )
+    write_report(args.report, result)
+
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
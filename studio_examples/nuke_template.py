@@ -0,0 +1,73 @@
+import collections
+
+
+BlurJob = collections.namedtuple(
+    "BlurJob", "source destination blur_value start_frame end_frame"
+)
+
+
+class BlurTemplate(object):
+    """
+    The Read -> Blur -> Write graph used by nuke_example.blur_input, built once
+    and then re-parameterised for each job, rather than creating and deleting
+    three nodes every time.
+
+    Example:
+        template = BlurTemplate()
+        template.render(BlurJob(source, destination, 10, 1001, 1100))
+        template.render(BlurJob(other_source, other_destination, 5, 1, 50))
+        template.delete()
+    """
+
+    def __init__(self):
+        # Imported here rather than at the top so that this module can be
+        # imported before nuke_render.use_backend has chosen the nuke module
+        import nuke
+
+        self._nuke = nuke
+        # Nodes are connected explicitly rather than relying on the selection,
+        # so the graph is correct whatever was selected when it was built
+        self.read_node = nuke.createNode("Read", inpanel=False)
+        self.blur_node = nuke.createNode("Blur", inpanel=False)
+        self.blur_node.setInput(0, self.read_node)
+        self.write_node = nuke.createNode("Write", inpanel=False)
+        self.write_node.setInput(0, self.blur_node)
+
+    def __repr__(self):
+        return "BlurTemplate({}, {}, {})".format(
+            self.read_node.name(), self.blur_node.name(), self.write_node.name()
+        )
+
+    def set_job(self, job):
+        """
+        Args:
+            job (BlurJob): Job to set the nodes' knobs for
+        """
+        self.read_node["file"].setValue(job.source)
+        self.read_node["first"].setValue(job.start_frame)
+        self.read_node["last"].setValue(job.end_frame)
+        self.blur_node["size"].setValue(job.blur_value)
+        self.write_node["file"].setValue(job.destination)
+
+    def render(self, job):
+        """
+        Args:
+            job (BlurJob): Job to render
+        """
+        self.set_job(job)
+        self.execute(job.start_frame, job.end_frame)
+
+    def execute(self, start_frame, end_frame):
+        """
+        Renders frames with the knobs as they're currently set.
+
+        Args:
+            start_frame (int): First frame
+            end_frame (int): Last frame, inclusive
+        """
+        self._nuke.execute(self.write_node, start_frame, end_frame)
+
+    def delete(self):
+        """Deletes the template's nodes."""
+        for node in (self.write_node, self.blur_node, self.read_node):
+            self._nuke.delete(node)
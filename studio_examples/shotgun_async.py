@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+
+import shotgun_api3
+
+from shotgun_example import sequence_shots_query
+
+
+# HTTP status codes the server uses when too many requests are being made
+THROTTLED_STATUS_CODES = (429, 503)
+
+
+def is_throttled(error):
+    """
+    Args:
+        error (Exception): Error raised by a Shotgun call
+
+    Returns:
+        bool: True if the call failed because the server is limiting requests,
+            in which case it's worth retrying after a delay
+    """
+    return (
+        isinstance(error, shotgun_api3.ProtocolError)
+        and error.errcode in THROTTLED_STATUS_CODES
+    )
+
+
+class TokenBucket(object):
+    """
+    Limits how often something can happen. Tokens are added at a steady rate up
+    to a maximum of capacity, and each acquire uses one, waiting if there are
+    none left. This allows short bursts of up to capacity requests while keeping
+    the average below rate.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (int): Maximum number of tokens that can be saved up
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def __repr__(self):
+        return "TokenBucket(rate={}, capacity={})".format(self.rate, self.capacity)
+
+    async def acquire(self):
+        # The lock makes waiters take tokens in the order they arrived
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncQueryRunner(object):
+    """
+    Runs Shotgun find calls from asyncio code, many at a time, in threads.
+
+    Requests are started no faster than the token bucket allows, so that a
+    dashboard making hundreds of queries stays under the site's API limits.
+    Calls that fail because the server is throttling requests are retried after
+    an exponentially increasing delay.
+
+    Shotgun connections can't be used by two threads at once, so connections are
+    made by calling connection_factory inside each worker thread. Passing a
+    shotgun_pool.SessionProvider's get_connection gives each thread its own
+    reused connection, eg,
+
+        provider = shotgun_pool.get_provider(site, user, password)
+        runner = AsyncQueryRunner(provider.get_connection)
+
+    Args:
+        connection_factory (callable): Returns the Shotgun connection to use for
+            the current thread
+        max_concurrency (int): Maximum number of calls running at once
+        rate (float): Maximum average number of calls started per second
+        burst (int): Maximum number of calls that can be started at once
+        max_retries (int): Number of times to retry a throttled call
+        backoff (float): Seconds to wait before the first retry. Doubles for
+            each retry after that.
+        executor (concurrent.futures.Executor): Executor to run calls in.
+            Defaults to the event loop's default executor.
+    """
+
+    def __init__(
+        self,
+        connection_factory,
+        max_concurrency=8,
+        rate=10.0,
+        burst=10,
+        max_retries=5,
+        backoff=0.5,
+        executor=None,
+    ):
+        self.connection_factory = connection_factory
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.executor = executor
+        self.retries = 0
+        self._bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _find(self, entity_type, filters, fields, kwargs):
+        sg_connection = self.connection_factory()
+        return sg_connection.find(entity_type, filters, fields, **kwargs)
+
+    async def find(self, entity_type, filters, fields=None, **kwargs):
+        """
+        The same as sg_connection.find, without blocking the event loop.
+
+        Raises:
+            shotgun_api3.ProtocolError: If the call is still being throttled
+                after max_retries
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            await self._bucket.acquire()
+            async with self._semaphore:
+                try:
+                    return await loop.run_in_executor(
+                        self.executor,
+                        self._find,
+                        entity_type,
+                        filters,
+                        fields,
+                        kwargs,
+                    )
+                except Exception as error:
+                    if not is_throttled(error) or attempt >= self.max_retries:
+                        raise
+            # Jitter stops every throttled call retrying at exactly the same time
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    async def find_many(self, queries):
+        """
+        Args:
+            queries (list[tuple]): Arguments for find of each query, as
+                (entity_type, filters, fields)
+
+        Returns:
+            list[list[dict]]: Result of each query, in the same order as the
+                queries, regardless of which finished first
+        """
+        return await asyncio.gather(*(self.find(*query) for query in queries))
+
+
+async def get_projects_sequence_shots(runner, project_sequences):
+    """
+    Concurrently finds the shots of many sequences, the same as calling
+    shotgun_example.get_sequence_shots for each.
+
+    Args:
+        runner (AsyncQueryRunner): Runner to make the queries with
+        project_sequences (list[tuple[str, str]]): (project, sequence) codes
+
+    Returns:
+        dict: Mapping of each (project, sequence) to its list of shots, in the
+            same order as project_sequences. Shots are ordered by id, so the
+            result is the same every time the data is unchanged.
+    """
+    order = [{"field_name": "id", "direction": "asc"}]
+    results = await asyncio.gather(
+        *(
+            runner.find(
+                "Shot",
+                *sequence_shots_query(project_name, sequence_name),
+                order=order,
+            )
+            for project_name, sequence_name in project_sequences
+        )
+    )
+    return dict(zip(project_sequences, results))
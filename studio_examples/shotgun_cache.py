@@ -0,0 +1,232 @@
+import collections
+import copy
+import json
+import re
+import threading
+import time
+
+# Matches the entity type in a linked field path, eg, "Sequence" in
+# "sg_sequence.Sequence.description"
+LINKED_TYPE_RE = re.compile(r"\.([A-Z]\w*)\.")
+
+
+def make_key(entity_type, filters, fields, *args, **kwargs):
+    """
+    Args:
+        entity_type (str): Entity type being queried, eg, "Shot"
+        filters (list): Shotgun filters
+        fields (list[str]): Fields being returned
+        *args: Any other arguments passed to find, eg, order or limit
+        **kwargs: Any other keyword arguments passed to find
+
+    Returns:
+        tuple: Hashable key that is the same for identical queries
+    """
+    # Filters are nested lists, so they're serialised to make them hashable.
+    # Fields are sorted as their order doesn't change the result.
+    return (
+        entity_type,
+        json.dumps(filters, sort_keys=True, default=str),
+        tuple(sorted(fields or ())),
+        json.dumps([args, kwargs], sort_keys=True, default=str),
+    )
+
+
+class QueryCache(object):
+    """
+    Thread-safe cache of query results, where each result expires after a fixed
+    time and the least recently used results are dropped once the cache is
+    larger than max_bytes.
+
+    The size of each result is estimated from its JSON size, which is close to
+    the amount of data the server sent for it.
+
+    Args:
+        ttl (float): Seconds a result is valid for
+        max_bytes (int): Approximate maximum size of all cached results
+    """
+
+    def __init__(self, ttl=60.0, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        # Ordered from least to most recently used
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "QueryCache(entries={}, size={}, hits={}, misses={})".format(
+            len(self._entries), self.size, self.hits, self.misses
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit, miss and eviction counts, and the current size
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / float(total) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size,
+            }
+
+    def get(self, key):
+        """
+        Args:
+            key (tuple): Key made with make_key
+
+        Returns:
+            list[dict]: Cached result, or None if it's not cached or has expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, size, value = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Copied so that callers modifying the result don't modify the cache
+        return copy.deepcopy(value)
+
+    def set(self, key, value):
+        """
+        Args:
+            key (tuple): Key made with make_key
+            value (list[dict]): Result to cache
+        """
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    @staticmethod
+    def _uses_type(key, entity_type):
+        # True if the query is for the entity type, or its filters or fields
+        # read it through a linked field, eg, a Shot query for
+        # "sg_sequence.Sequence.description" uses Sequence
+        if key[0] == entity_type:
+            return True
+        paths = key[1] + " " + " ".join(key[2])
+        return entity_type in LINKED_TYPE_RE.findall(paths)
+
+    def invalidate(self, entity_type=None):
+        """
+        Args:
+            entity_type (str): Only remove results for this entity type, and
+                results that use it through linked fields. If not given, the
+                whole cache is cleared.
+        """
+        with self._lock:
+            if entity_type is None:
+                self._entries.clear()
+                self.size = 0
+                return
+            for key in [
+                key for key in self._entries if self._uses_type(key, entity_type)
+            ]:
+                self._remove(key)
+
+
+class CachedConnection(object):
+    """
+    Wraps a Shotgun connection so that find calls are served from a cache. It can
+    be passed anywhere a connection is expected, eg,
+
+        sg_connection = CachedConnection(get_shotgun_connection(...))
+        shots = get_sequence_shots(sg_connection, project, sequence)
+
+    Calls that modify data invalidate every cached result for the entity type
+    they modify, including results that read it through a linked field, eg,
+    "sg_sequence.Sequence.description" on Shots. The results are invalidated
+    both before and after the change, so a find running at the same time
+    can't leave the old data cached. Changes made by other people are only seen
+    once the cached result expires, or after calling invalidate.
+
+    Any other method is passed straight through to the wrapped connection.
+
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to wrap
+        cache (QueryCache): Cache to use. Any object with the same get, set and
+            invalidate methods can be used instead. Defaults to a new QueryCache.
+    """
+
+    def __init__(self, sg_connection, cache=None):
+        self.sg_connection = sg_connection
+        self.cache = cache if cache is not None else QueryCache()
+
+    def __getattr__(self, name):
+        return getattr(self.sg_connection, name)
+
+    def find(self, entity_type, filters, fields=None, *args, **kwargs):
+        key = make_key(entity_type, filters, fields, *args, **kwargs)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.sg_connection.find(
+                entity_type, filters, fields, *args, **kwargs
+            )
+            self.cache.set(key, result)
+        return result
+
+    def invalidate(self, entity_type=None):
+        """
+        Args:
+            entity_type (str): Only remove results for this entity type, and
+                results that use it through linked fields. If not given, the
+                whole cache is cleared.
+        """
+        self.cache.invalidate(entity_type)
+
+    def _write(self, entity_types, method, *args, **kwargs):
+        for entity_type in entity_types:
+            self.invalidate(entity_type)
+        try:
+            return getattr(self.sg_connection, method)(*args, **kwargs)
+        finally:
+            # A find that ran during the write may have cached the old data
+            for entity_type in entity_types:
+                self.invalidate(entity_type)
+
+    def create(self, entity_type, *args, **kwargs):
+        return self._write([entity_type], "create", entity_type, *args, **kwargs)
+
+    def update(self, entity_type, *args, **kwargs):
+        return self._write([entity_type], "update", entity_type, *args, **kwargs)
+
+    def delete(self, entity_type, *args, **kwargs):
+        return self._write([entity_type], "delete", entity_type, *args, **kwargs)
+
+    def revive(self, entity_type, *args, **kwargs):
+        return self._write([entity_type], "revive", entity_type, *args, **kwargs)
+
+    def batch(self, requests):
+        entity_types = sorted({request["entity_type"] for request in requests})
+        return self._write(entity_types, "batch", requests)
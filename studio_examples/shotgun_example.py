@@ -3,6 +3,9 @@ import sys
 # This must be installed first - see installation guide link below
 import shotgun_api3
 
+import shotgun_metrics
+import shotgun_pool
+
 
 # Shotgun Python API installation guide:
 #   https://developer.shotgunsoftware.com/python-api/installation.html
@@ -14,7 +17,13 @@ import shotgun_api3
 #   https://developer.shotgunsoftware.com/python-api/filter_syntax.html
 
 
-def get_sequence_shots(sg_connection, project_name, sequence_name):
+# Fields requested for each shot by every function that gets a sequence's shots
+SHOT_FIELDS = ["code", "description", "assets", "sg_sequence.Sequence.description"]
+
+
+def sequence_shots_query(project_name, sequence_name):
+    # Returns new (filters, fields) lists for finding the shots of a sequence,
+    # so the caller can add to them.
     # See the filter syntax documentation for how to use these
     # Note, "code" is a shorthand code that's useful for developers but is different
     # from the display name you see on the shotgun site. Switch "code" to "name"
@@ -23,43 +32,164 @@ def get_sequence_shots(sg_connection, project_name, sequence_name):
         ["project.Project.code", "is", project_name],
         ["sg_sequence.Sequence.code", "is", sequence_name],
     ]
-    fields = ["code", "description", "assets", "sg_sequence.Sequence.description"]
+    return filters, list(SHOT_FIELDS)
+
+
+def get_sequence_shots(sg_connection, project_name, sequence_name):
+    filters, fields = sequence_shots_query(project_name, sequence_name)
     shots = sg_connection.find("Shot", filters, fields)
     return shots
 
 
-def print_sequence_info(sequence_name, shots):
-    print("Sequence {} has {} shots".format(sequence_name, len(shots)))
+def iter_find(sg_connection, entity_type, filters, fields, page_size=500):
+    # The same as sg_connection.find, but instead of waiting for every entity to
+    # be loaded into one big list, they're requested a page at a time and
+    # yielded as soon as each page arrives. This is a generator, so it's used in
+    # a for loop, eg,
+    #   for shot in iter_find(sg_connection, "Shot", filters, fields):
+    # Entities are ordered by id, and each page asks for the entities after the
+    # last id of the previous page. Numbered pages would skip or repeat entities
+    # if any were created or deleted while iterating, as everything after them
+    # shifts to a different page.
+    order = [{"field_name": "id", "direction": "asc"}]
+    last_id = None
+    while True:
+        page_filters = list(filters)
+        if last_id is not None:
+            page_filters.append(["id", "greater_than", last_id])
+        entities = sg_connection.find(
+            entity_type, page_filters, fields, order=order, limit=page_size
+        )
+        for entity in entities:
+            yield entity
+        # A page that isn't full means there are no more pages
+        if len(entities) < page_size:
+            return
+        last_id = entities[-1]["id"]
+
+
+def iter_sequence_shots(sg_connection, project_name, sequence_name, page_size=500):
+    # The same as get_sequence_shots, but yields the shots a page at a time
+    # using iter_find, so they can be used before they've all been loaded
+    filters, fields = sequence_shots_query(project_name, sequence_name)
+    return iter_find(sg_connection, "Shot", filters, fields, page_size=page_size)
+
+
+def get_sequences_shots(sg_connection, project_names, sequence_names, chunk_size=100):
+    # Calling get_sequence_shots for each sequence means waiting for a separate
+    # round trip to the server every time. Instead, this uses the "in" operator to
+    # find the shots for many sequences in a single query. Very long filters can
+    # be rejected by the server, so the sequences are split into chunks of
+    # chunk_size with one query per chunk.
+    # project_names can be a single project or a list of projects. The result is
+    # a dictionary mapping (project_name, sequence_name) to the list of shots,
+    # with an empty list for any sequence that has no shots.
+    if isinstance(project_names, str):
+        project_names = [project_names]
+    fields = SHOT_FIELDS + [
+        # Needed to work out which sequence each shot belongs to
+        "project.Project.code",
+        "sg_sequence.Sequence.code",
+    ]
+
+    # Created up front so the results keep the order they were asked for in.
+    # Shotgun matches codes without caring about case, so the shots are matched
+    # back to their sequence using lowercase codes.
+    sequence_shots = {}
+    keys = {}
+    for project_name in project_names:
+        for sequence_name in sequence_names:
+            sequence_shots[(project_name, sequence_name)] = []
+            keys[(project_name.lower(), sequence_name.lower())] = (
+                project_name,
+                sequence_name,
+            )
 
-    if shots:
-        sequence_description = shots[0].get("sg_sequence.Sequence.description", "")
-        print("\tDescription: {}\n".format(sequence_description))
+    for start in range(0, len(sequence_names), chunk_size):
+        chunk = sequence_names[start:start + chunk_size]
+        filters = [
+            ["project.Project.code", "in", project_names],
+            ["sg_sequence.Sequence.code", "in", chunk],
+        ]
+        for shot in sg_connection.find("Shot", filters, fields):
+            key = keys[
+                (
+                    shot["project.Project.code"].lower(),
+                    shot["sg_sequence.Sequence.code"].lower(),
+                )
+            ]
+            sequence_shots[key].append(shot)
+    return sequence_shots
 
+
+def print_sequence_info(sequence_name, shots):
+    # shots can be a list, or a generator such as iter_sequence_shots. The length
+    # of a generator isn't known until every shot has been read, so in that case
+    # the number of shots is printed at the end instead of waiting for all of
+    # them before printing anything.
+    # This is meant for reading. For reports on many shots that other tools will
+    # read, shotgun_output.write_sequence_info writes the same information as
+    # JSON Lines or CSV, and is much faster for large numbers of shots.
+    count_known = hasattr(shots, "__len__")
+    if count_known:
+        print("Sequence {} has {} shots".format(sequence_name, len(shots)))
+    else:
+        print("Sequence {}".format(sequence_name))
+
+    count = 0
     for shot in shots:
+        # The description is the same on every shot, so it's taken from the first
+        if count == 0:
+            sequence_description = shot.get("sg_sequence.Sequence.description", "")
+            print("\tDescription: {}\n".format(sequence_description))
+        count += 1
         print(
             "\t{} : {} assets : {}".format(
                 shot["code"], len(shot["assets"]), shot["description"]
             )
         )
 
-
-def get_shotgun_connection(site, user, password):
-    # Must have a valid login to make a connection to query the database
-    return shotgun_api3.Shotgun(site, login=user, password=password)
+    if not count_known:
+        print("Sequence {} has {} shots".format(sequence_name, count))
+
+
+def get_shotgun_connection(site, user, password, pooled=True, token_path=None):
+    # Must have a valid login to make a connection to query the database.
+    # Logging in takes a while, so by default connections are reused: each
+    # thread keeps its own connection, logged in with the same session. See
+    # shotgun_pool. Passing a token_path, eg, shotgun_pool.DEFAULT_TOKEN_PATH,
+    # also saves the session to that file so that other scripts run soon after
+    # don't need to log in again. Anyone who can read the file can use the
+    # session, so it's only done when asked for.
+    # Setting the SHOTGUN_METRICS environment variable times every query and
+    # prints a summary when the script exits. See shotgun_metrics.
+    if pooled:
+        provider = shotgun_pool.get_provider(
+            site, user, password, token_path=token_path
+        )
+        sg_connection = provider.get_connection()
+    else:
+        sg_connection = shotgun_api3.Shotgun(site, login=user, password=password)
+    return shotgun_metrics.instrument(sg_connection)
 
 
 def main():
     # sys.argv captures the extra arguments from the command line after the script name.
     # It will also capture the filepath of the script being run as the first value,
-    # hence why we expect 6 values even though we only want 5
-    if len(sys.argv) != 6:
-        print("Usage: shotgun_example.py SITE USER PASSWORD PROJECT SEQUENCE")
+    # hence why we expect at least 6 values even though we only want 5. Any
+    # number of sequences can be given after the project.
+    if len(sys.argv) < 6:
+        print(
+            "Usage: shotgun_example.py SITE USER PASSWORD PROJECT SEQUENCE [SEQUENCE ...]"
+        )
         sys.exit(1)
 
-    _, site, user, password, project, sequence = sys.argv
+    site, user, password, project = sys.argv[1:5]
+    sequences = sys.argv[5:]
     sg_connection = get_shotgun_connection(site, user, password)
-    shots = get_sequence_shots(sg_connection, project, sequence)
-    print_sequence_info(sequence, shots)
+    sequence_shots = get_sequences_shots(sg_connection, project, sequences)
+    for (_, sequence), shots in sequence_shots.items():
+        print_sequence_info(sequence, shots)
 
     sys.exit(0)
 
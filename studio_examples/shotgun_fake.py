@@ -0,0 +1,537 @@
+"""
+In-process stand-in for shotgun_api3.Shotgun, for testing and benchmarking the
+shotgun tools without a live site.
+
+Usage:
+    python shotgun_fake.py FIXTURE [--projects N] [--sequences N] [--shots N]
+        [--assets N] [--seed N]
+"""
+import argparse
+import copy
+import datetime
+import json
+import random
+import threading
+import time
+
+
+# Multi-entity fields that are stored as connection entities on a real site, as
+# (entity type, field): (connection entity type, field linking back, field
+# linking to the other entity)
+CONNECTIONS = {
+    ("Shot", "assets"): ("AssetShotConnection", "shot", "asset"),
+}
+
+
+def generate_fixture(
+    projects=1,
+    sequences_per_project=50,
+    shots_per_sequence=2000,
+    assets_per_project=500,
+    max_assets_per_shot=20,
+    seed=0,
+):
+    """
+    Generates Projects, Sequences, Shots and Assets linked together the same
+    way they are on a real site. The defaults make 100,000 shots.
+
+    Args:
+        projects (int): Number of projects, with codes proj00, proj01, ...
+        sequences_per_project (int): Sequences in each project, with codes
+            seq000, seq001, ...
+        shots_per_sequence (int): Shots in each sequence
+        assets_per_project (int): Assets in each project
+        max_assets_per_shot (int): Each shot links to a random number of the
+            project's assets, up to this many
+        seed (int): Random seed, so the same fixture is generated every time
+
+    Returns:
+        dict[str, list[dict]]: Entities of each type, ready to save as JSON
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def timestamp(entity_id):
+        # Entities were each last updated a second apart, so that syncing only
+        # the changes since some time returns part of the data
+        return (start + datetime.timedelta(seconds=entity_id)).isoformat()
+
+    data = {"Project": [], "Sequence": [], "Shot": [], "Asset": []}
+
+    for project_index in range(projects):
+        project = {
+            "type": "Project",
+            "id": project_index + 1,
+            "code": "proj{:02d}".format(project_index),
+            "name": "Project {}".format(project_index),
+            "updated_at": timestamp(project_index + 1),
+        }
+        data["Project"].append(project)
+        project_link = {"type": "Project", "id": project["id"], "name": project["name"]}
+
+        assets = []
+        for asset_index in range(assets_per_project):
+            asset = {
+                "type": "Asset",
+                "id": len(data["Asset"]) + 1,
+                "code": "asset{:04d}".format(asset_index),
+                "project": project_link,
+                "updated_at": timestamp(len(data["Asset"]) + 1),
+            }
+            data["Asset"].append(asset)
+            assets.append({"type": "Asset", "id": asset["id"], "name": asset["code"]})
+
+        for sequence_index in range(sequences_per_project):
+            sequence = {
+                "type": "Sequence",
+                "id": len(data["Sequence"]) + 1,
+                "code": "seq{:03d}".format(sequence_index),
+                "description": "Sequence {} of {}".format(
+                    sequence_index, project["code"]
+                ),
+                "project": project_link,
+                "updated_at": timestamp(len(data["Sequence"]) + 1),
+            }
+            data["Sequence"].append(sequence)
+            sequence_link = {
+                "type": "Sequence",
+                "id": sequence["id"],
+                "name": sequence["code"],
+            }
+
+            for shot_index in range(shots_per_sequence):
+                shot_assets = rng.sample(
+                    assets, rng.randint(0, min(max_assets_per_shot, len(assets)))
+                )
+                data["Shot"].append(
+                    {
+                        "type": "Shot",
+                        "id": len(data["Shot"]) + 1,
+                        "code": "{}_{:04d}".format(sequence["code"], shot_index * 10),
+                        "description": "Shot {}".format(shot_index),
+                        "project": project_link,
+                        "sg_sequence": sequence_link,
+                        "assets": sorted(shot_assets, key=lambda link: link["id"]),
+                        "updated_at": timestamp(len(data["Shot"]) + 1),
+                    }
+                )
+    return data
+
+
+def write_fixture(path, **kwargs):
+    """
+    Args:
+        path (str): JSON file to write
+        **kwargs: Arguments for generate_fixture
+    """
+    with open(path, "w") as handle:
+        json.dump(generate_fixture(**kwargs), handle)
+
+
+def _is_link(value):
+    return isinstance(value, dict) and "type" in value and "id" in value
+
+
+def _normalise(value):
+    # Links are compared by type and id, text is compared without caring about
+    # case, the same as on a real site
+    if _is_link(value):
+        return (value["type"], value["id"])
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def _sort_key(value):
+    # Empty values sort first rather than failing to compare with other values
+    return (value is not None, _normalise(value))
+
+
+def _any_in(value, keys):
+    if isinstance(value, list):
+        # Multi-entity fields match if any of their links match
+        return any(_normalise(item) in keys for item in value)
+    return _normalise(value) in keys
+
+
+def _check_is(expected):
+    keys = {_normalise(expected)}
+    return lambda value: _any_in(value, keys)
+
+
+def _check_in(expected):
+    keys = {_normalise(item) for item in expected}
+    return lambda value: _any_in(value, keys)
+
+
+def _check_is_not(expected):
+    check = _check_is(expected)
+    return lambda value: not check(value)
+
+
+def _check_not_in(expected):
+    check = _check_in(expected)
+    return lambda value: not check(value)
+
+
+def _check_greater_than(expected):
+    return lambda value: value is not None and value > expected
+
+
+def _check_less_than(expected):
+    return lambda value: value is not None and value < expected
+
+
+def _check_contains(expected):
+    expected = expected.lower()
+    return lambda value: value is not None and expected in value.lower()
+
+
+# Each operator makes a function testing a field value against the filter value.
+# Filter values are prepared once per query, eg, "in" lists become sets, so
+# filtering 100,000s of entities stays fast.
+OPERATORS = {
+    "is": _check_is,
+    "is_not": _check_is_not,
+    "in": _check_in,
+    "not_in": _check_not_in,
+    "greater_than": _check_greater_than,
+    "less_than": _check_less_than,
+    "contains": _check_contains,
+}
+
+
+class FakeShotgun(object):
+    """
+    In-process stand-in for shotgun_api3.Shotgun that serves entities from memory.
+
+    Supports find with the filter syntax used by the shotgun tools: dotted link
+    paths (eg, "project.Project.code"), the operators in OPERATORS, "all" and
+    "any" filter operators, order, limit and page. summarize supports counting
+    grouped by an entity field. create and update are supported so that cache
+    invalidation can be tested.
+
+    Queries are answered quickly enough to load test with large fixtures: fields
+    used by "is" and "in" filters are indexed the first time they're used, and
+    paging through a result, by page number or by id as iter_find does, only
+    filters and sorts it for the first page.
+
+    Every call sleeps for latency seconds, plus latency_per_entity for each
+    entity returned, to simulate the server and network.
+
+    Attributes:
+        calls (dict[str, int]): Number of times each method has been called
+
+    Args:
+        data (dict[str, list[dict]]): Entities of each type, eg, from
+            generate_fixture
+        latency (float): Seconds added to every call
+        latency_per_entity (float): Seconds added for each entity returned
+    """
+
+    def __init__(self, data, latency=0.0, latency_per_entity=0.0):
+        self.latency = latency
+        self.latency_per_entity = latency_per_entity
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._last_query = None
+        self._entities = {}
+        for entity_type, entities in data.items():
+            self._entities[entity_type] = {
+                entity["id"]: self._load(entity) for entity in entities
+            }
+
+    @classmethod
+    def from_fixture(cls, path, **kwargs):
+        """
+        Args:
+            path (str): JSON fixture, eg, written by write_fixture
+            **kwargs: Extra arguments for FakeShotgun
+
+        Returns:
+            FakeShotgun: Fake site containing the fixture's entities
+        """
+        with open(path) as handle:
+            return cls(json.load(handle), **kwargs)
+
+    def __repr__(self):
+        return "FakeShotgun({})".format(
+            ", ".join(
+                "{}={}".format(entity_type, len(entities))
+                for entity_type, entities in sorted(self._entities.items())
+            )
+        )
+
+    @staticmethod
+    def _load(entity):
+        entity = dict(entity)
+        if isinstance(entity.get("updated_at"), str):
+            entity["updated_at"] = datetime.datetime.fromisoformat(entity["updated_at"])
+        return entity
+
+    def _get_entities(self, entity_type):
+        # Connection entities are only built the first time they're queried, as
+        # there are millions of them in a large fixture
+        for (linked_type, field), connection in CONNECTIONS.items():
+            if connection[0] == entity_type and entity_type not in self._entities:
+                with self._lock:
+                    if entity_type not in self._entities:
+                        self._build_connections(linked_type, field, *connection)
+        return self._entities.get(entity_type, {})
+
+    def _build_connections(self, entity_type, field, connection_type, back, forward):
+        connections = {}
+        for entity in self._entities[entity_type].values():
+            for link in entity.get(field) or ():
+                connection_id = len(connections) + 1
+                connections[connection_id] = {
+                    "type": connection_type,
+                    "id": connection_id,
+                    back: {"type": entity_type, "id": entity["id"]},
+                    forward: link,
+                }
+        self._entities[connection_type] = connections
+
+    def _call(self, name, result_count=0):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency + self.latency_per_entity * result_count
+        if delay:
+            time.sleep(delay)
+
+    def _get_field(self, entity, field):
+        # Follows dotted paths, eg, "project.Project.code" reads the "project"
+        # link, then the "code" field of that Project
+        parts = field.split(".")
+        value = entity.get(parts[0])
+        for index in range(1, len(parts) - 1, 2):
+            if not _is_link(value):
+                return None
+            linked = self._entities.get(parts[index], {}).get(value["id"])
+            if linked is None:
+                return None
+            value = linked.get(parts[index + 1])
+        return value
+
+    def _compile(self, filters, filter_operator="all"):
+        # Turns filters into a single function testing whether an entity matches
+        checks = []
+        for condition in filters:
+            if isinstance(condition, dict):
+                checks.append(
+                    self._compile(condition["filters"], condition["filter_operator"])
+                )
+                continue
+            field, operator, expected = condition[0], condition[1], condition[2]
+            try:
+                make_check = OPERATORS[operator]
+            except KeyError:
+                raise NotImplementedError(
+                    "FakeShotgun doesn't support the {!r} operator".format(operator)
+                )
+            check = make_check(expected)
+            checks.append(
+                lambda entity, field=field, check=check: check(
+                    self._get_field(entity, field)
+                )
+            )
+
+        if filter_operator == "any" and checks:
+            return lambda entity: any(check(entity) for check in checks)
+        return lambda entity: all(check(entity) for check in checks)
+
+    def _get_index(self, entity_type, field):
+        # Maps each value of a field to the ids of the entities with that value,
+        # built the first time an "is" or "in" filter uses the field
+        key = (entity_type, field)
+        index = self._indexes.get(key)
+        if index is None:
+            index = {}
+            for entity in self._get_entities(entity_type).values():
+                value = self._get_field(entity, field)
+                for item in value if isinstance(value, list) else [value]:
+                    index.setdefault(_normalise(item), []).append(entity["id"])
+            with self._lock:
+                self._indexes[key] = index
+        return index
+
+    def _candidates(self, entity_type, filters, filter_operator):
+        # Uses the most selective "is" or "in" filter to pick the entities worth
+        # testing, so that a query for one sequence doesn't test every shot
+        if filter_operator == "any":
+            return None
+        best = None
+        for condition in filters:
+            if isinstance(condition, dict) or condition[1] not in ("is", "in"):
+                continue
+            values = [condition[2]] if condition[1] == "is" else condition[2]
+            index = self._get_index(entity_type, condition[0])
+            ids = set()
+            for value in values:
+                ids.update(index.get(_normalise(value), ()))
+            if best is None or len(ids) < len(best):
+                best = ids
+        return best
+
+    def _query(self, entity_type, filters, filter_operator=None):
+        matches = self._compile(filters, filter_operator or "all")
+        entities = self._get_entities(entity_type)
+        ids = self._candidates(entity_type, filters, filter_operator)
+        if ids is None:
+            candidates = entities.values()
+        else:
+            candidates = [entities[entity_id] for entity_id in sorted(ids)]
+        return [entity for entity in candidates if matches(entity)]
+
+    def _ordered(self, entity_type, filters, filter_operator, order):
+        # Paging through a large result calls find with the same query for every
+        # page. The last query's ordered result is kept so that later pages only
+        # have to slice it, like a cursor on the server, rather than filtering
+        # and sorting everything again for each page.
+        key = repr((entity_type, filters, filter_operator, order))
+        last_query = self._last_query
+        if last_query is not None and last_query[0] == key:
+            return last_query[1]
+
+        entities = self._query(entity_type, filters, filter_operator)
+        for sort in reversed(order or []):
+            entities.sort(
+                key=lambda entity: _sort_key(
+                    self._get_field(entity, sort["field_name"])
+                ),
+                reverse=sort.get("direction") == "desc",
+            )
+        with self._lock:
+            self._last_query = (key, entities)
+        return entities
+
+    def find(
+        self,
+        entity_type,
+        filters,
+        fields=None,
+        order=None,
+        filter_operator=None,
+        limit=0,
+        retired_only=False,
+        page=0,
+        **kwargs
+    ):
+        # Paging by id adds ["id", "greater_than", last_id] to the same query for
+        # each page. Ordered by id, the page starts after last_id in the result
+        # of the rest of the query, which is kept the same as for page numbers.
+        after_id = None
+        if (
+            filters
+            and filter_operator in (None, "all")
+            and order == [{"field_name": "id", "direction": "asc"}]
+            and list(filters[-1][:2]) == ["id", "greater_than"]
+        ):
+            after_id = filters[-1][2]
+            filters = filters[:-1]
+        entities = self._ordered(entity_type, filters, filter_operator, order)
+        if after_id is not None:
+            low, high = 0, len(entities)
+            while low < high:
+                middle = (low + high) // 2
+                if entities[middle]["id"] <= after_id:
+                    low = middle + 1
+                else:
+                    high = middle
+            entities = entities[low:]
+        if limit:
+            start = (page - 1) * limit if page > 0 else 0
+            entities = entities[start:start + limit]
+
+        results = []
+        for entity in entities:
+            result = {"type": entity_type, "id": entity["id"]}
+            for field in fields or ():
+                result[field] = copy.deepcopy(self._get_field(entity, field))
+            results.append(result)
+        self._call("find", len(results))
+        return results
+
+    def find_one(self, entity_type, filters, fields=None, order=None, **kwargs):
+        results = self.find(entity_type, filters, fields, order=order, limit=1)
+        return results[0] if results else None
+
+    def summarize(
+        self, entity_type, filters, summary_fields, filter_operator=None, grouping=None
+    ):
+        entities = self._query(entity_type, filters, filter_operator)
+        for summary_field in summary_fields:
+            if summary_field["type"] != "count":
+                raise NotImplementedError("FakeShotgun can only summarize counts")
+
+        def summarise(group):
+            return {
+                summary_field["field"]: len(group) for summary_field in summary_fields
+            }
+
+        result = {"summaries": summarise(entities), "groups": []}
+        if grouping:
+            groups = {}
+            field = grouping[0]["field"]
+            for entity in entities:
+                value = self._get_field(entity, field)
+                groups.setdefault(_normalise(value), (value, []))[1].append(entity)
+            for key in sorted(groups, key=str):
+                value, group = groups[key]
+                result["groups"].append(
+                    {
+                        "group_name": str(value["id"] if _is_link(value) else value),
+                        "group_value": value,
+                        "summaries": summarise(group),
+                    }
+                )
+        self._call("summarize", len(result["groups"]))
+        return result
+
+    def create(self, entity_type, data, return_fields=None):
+        with self._lock:
+            entities = self._entities.setdefault(entity_type, {})
+            entity = dict(data, type=entity_type, id=max(entities, default=0) + 1)
+            entity["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+            entities[entity["id"]] = entity
+            self._indexes.clear()
+            self._last_query = None
+        self._call("create", 1)
+        return dict(copy.deepcopy(data), type=entity_type, id=entity["id"])
+
+    def update(self, entity_type, entity_id, data, **kwargs):
+        with self._lock:
+            entity = self._entities[entity_type][entity_id]
+            entity.update(copy.deepcopy(data))
+            entity["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+            self._indexes.clear()
+            self._last_query = None
+        self._call("update", 1)
+        return dict(copy.deepcopy(data), type=entity_type, id=entity_id)
+
+    def get_session_token(self):
+        return "fake-session-token"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes a FakeShotgun JSON fixture")
+    parser.add_argument("fixture", help="JSON file to write")
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--sequences", type=int, default=50, help="Per project")
+    parser.add_argument("--shots", type=int, default=2000, help="Per sequence")
+    parser.add_argument("--assets", type=int, default=500, help="Per project")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_fixture(
+        args.fixture,
+        projects=args.projects,
+        sequences_per_project=args.sequences,
+        shots_per_sequence=args.shots,
+        assets_per_project=args.assets,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import threading
+
+from shotgun_example import sequence_shots_query
+
+
+# Multi-entity fields are stored on the server as "connection" entities, one per
+# link. Counting the connections of each entity gives the length of the field
+# without sending the linked entities. The connection entity and its field
+# linking back to the queried entity depend on the site's schema, so add more
+# fields here as they're needed.
+CONNECTION_ENTITIES = {
+    ("Shot", "assets"): ("AssetShotConnection", "shot"),
+    ("Asset", "shots"): ("AssetShotConnection", "asset"),
+    ("Sequence", "shots"): ("Shot", "sg_sequence"),
+}
+
+# Very long "in" filters can be rejected by the server
+CHUNK_SIZE = 500
+
+
+class _LinkLoader(object):
+    # Fetches a link field for every entity in a query result the first time any
+    # of them is accessed, so that reading the field on every row costs a single
+    # extra query rather than one per row
+    def __init__(self, sg_connection, entity_type, ids, field):
+        self.sg_connection = sg_connection
+        self.entity_type = entity_type
+        self.ids = ids
+        self.field = field
+        self._values = None
+        self._lock = threading.Lock()
+
+    def get(self, entity_id):
+        with self._lock:
+            if self._values is None:
+                self._values = {}
+                for start in range(0, len(self.ids), CHUNK_SIZE):
+                    entities = self.sg_connection.find(
+                        self.entity_type,
+                        [["id", "in", self.ids[start:start + CHUNK_SIZE]]],
+                        [self.field],
+                    )
+                    for entity in entities:
+                        self._values[entity["id"]] = entity[self.field] or []
+        return self._values.get(entity_id, [])
+
+
+class LazyLinks(object):
+    """
+    Stands in for the list of linked entities in a multi-entity field, eg,
+    shot["assets"], fetching them only if they're actually used.
+
+    If the field was counted, len() is answered without fetching anything.
+    Iterating, indexing, or len() of an uncounted field fetches the field for
+    every entity in the same query result at once.
+    """
+
+    def __init__(self, loader, entity_id, count=None):
+        self._loader = loader
+        self._entity_id = entity_id
+        self._count = count
+
+    def __repr__(self):
+        if self._count is not None:
+            return "LazyLinks(count={})".format(self._count)
+        return "LazyLinks({}.{})".format(self._loader.entity_type, self._loader.field)
+
+    def _links(self):
+        return self._loader.get(self._entity_id)
+
+    def __len__(self):
+        if self._count is not None:
+            return self._count
+        return len(self._links())
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self._links())
+
+    def __getitem__(self, index):
+        return self._links()[index]
+
+
+def count_links(sg_connection, entity_type, ids, field):
+    """
+    Counts the entities linked to each entity in a multi-entity field, without
+    fetching the links themselves.
+
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to query with
+        entity_type (str): Entity type the field belongs to, eg, "Shot"
+        ids (list[int]): Ids of the entities to count the links of
+        field (str): Multi-entity field, eg, "assets"
+
+    Raises:
+        ValueError: If the connection entity for the field isn't known
+
+    Returns:
+        dict[int, int]: Number of links for each id. Entities without any links
+            are included with a count of 0.
+    """
+    try:
+        connection_type, link_field = CONNECTION_ENTITIES[(entity_type, field)]
+    except KeyError:
+        raise ValueError(
+            "Can't count {}.{}, add its connection entity to "
+            "CONNECTION_ENTITIES".format(entity_type, field)
+        )
+
+    counts = dict.fromkeys(ids, 0)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        links = [
+            {"type": entity_type, "id": entity_id}
+            for entity_id in ids[start:start + CHUNK_SIZE]
+        ]
+        summary = sg_connection.summarize(
+            connection_type,
+            [[link_field, "in", links]],
+            summary_fields=[{"field": "id", "type": "count"}],
+            grouping=[{"field": link_field, "type": "exact", "direction": "asc"}],
+        )
+        for group in summary["groups"]:
+            counts[group["group_value"]["id"]] = group["summaries"]["id"]
+    return counts
+
+
+def find(sg_connection, entity_type, filters, fields, counts=(), lazy=()):
+    """
+    The same as sg_connection.find, but link fields that aren't needed in full
+    can be left out of the main query.
+
+    Fields in counts only have their length fetched, using one small summary
+    query for every CHUNK_SIZE entities. Fields in lazy aren't fetched at all
+    unless they're used. Both are returned as LazyLinks, which behave like the
+    list of entities normally returned, so code reading the result doesn't need
+    to change. eg, print_sequence_info only calls len(shot["assets"]), so
+
+        find(sg_connection, "Shot", filters, ["code"], counts=["assets"])
+
+    returns shots that work with it without sending every asset of every shot.
+
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to query with
+        entity_type (str): Entity type to find, eg, "Shot"
+        filters (list): Shotgun filters
+        fields (list[str]): Fields to fetch in full
+        counts (list[str]): Multi-entity fields to only count
+        lazy (list[str]): Multi-entity fields to only fetch if they're used
+
+    Returns:
+        list[dict]: Found entities
+    """
+    entities = sg_connection.find(entity_type, filters, fields)
+    if not entities or not (counts or lazy):
+        return entities
+
+    ids = [entity["id"] for entity in entities]
+    for field in set(counts) | set(lazy):
+        loader = _LinkLoader(sg_connection, entity_type, ids, field)
+        field_counts = (
+            count_links(sg_connection, entity_type, ids, field)
+            if field in counts
+            else {}
+        )
+        for entity in entities:
+            entity[field] = LazyLinks(
+                loader, entity["id"], count=field_counts.get(entity["id"])
+            )
+    return entities
+
+
+def get_sequence_shots(
+    sg_connection, project_name, sequence_name, counts=("assets",), lazy=()
+):
+    """
+    The same as shotgun_example.get_sequence_shots, but by default only counts
+    the assets of each shot, which is all print_sequence_info needs.
+
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to query with
+        project_name (str): Project code
+        sequence_name (str): Sequence code
+        counts (list[str]): Multi-entity fields to only count
+        lazy (list[str]): Multi-entity fields to only fetch if they're used
+
+    Returns:
+        list[dict]: Shots in the sequence
+    """
+    filters, fields = sequence_shots_query(project_name, sequence_name)
+    fields = [field for field in fields if field not in counts and field not in lazy]
+    return find(sg_connection, "Shot", filters, fields, counts=counts, lazy=lazy)
@@ -0,0 +1,345 @@
+import atexit
+import bisect
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+
+# Upper bounds of the latency histogram buckets, in seconds. Calls slower than
+# the last bound are counted in one extra overflow bucket.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Setting SHOTGUN_METRICS to anything other than "" or "0" instruments the
+# connections made by shotgun_example.get_shotgun_connection and prints a summary
+# when the process exits. SHOTGUN_SLOW_QUERY_LOG is a file to append slow
+# queries to.
+ENABLE_VARIABLE = "SHOTGUN_METRICS"
+SLOW_LOG_VARIABLE = "SHOTGUN_SLOW_QUERY_LOG"
+
+QueryRecord = collections.namedtuple(
+    "QueryRecord", "method entity_type filters elapsed count size error"
+)
+
+
+class Histogram(object):
+    """
+    Counts values in fixed buckets, so that recording is cheap and the memory
+    used doesn't grow with the number of values.
+
+    Args:
+        bounds (tuple[float]): Ascending upper bound of each bucket
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.max = 0.0
+
+    def __repr__(self):
+        return "Histogram(total={}, max={})".format(self.total, self.max)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Args:
+            percent (float): Percentile to find, from 0 to 100
+
+        Returns:
+            float: Upper bound of the bucket the percentile falls in, or the
+                largest value if it's in the overflow bucket. 0 if empty.
+        """
+        if not self.total:
+            return 0.0
+        target = self.total * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class QueryStats(object):
+    """Totals for every call of one method on one entity type."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.results = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.latency = Histogram()
+
+    def __repr__(self):
+        return "QueryStats(calls={}, seconds={:.3f})".format(self.calls, self.seconds)
+
+    def add(self, record):
+        self.calls += 1
+        self.seconds += record.elapsed
+        self.latency.add(record.elapsed)
+        if record.error is not None:
+            self.errors += 1
+        self.results += record.count
+        self.bytes += record.size
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "results": self.results,
+            "bytes": self.bytes,
+            "seconds": self.seconds,
+            "p50": self.latency.percentile(50),
+            "p90": self.latency.percentile(90),
+            "p99": self.latency.percentile(99),
+            "max": self.latency.max,
+            "histogram": dict(
+                zip(
+                    [str(bound) for bound in self.latency.bounds] + ["inf"],
+                    self.latency.counts,
+                )
+            ),
+        }
+
+
+class Instrumentation(object):
+    """
+    Collects timings of Shotgun calls made through InstrumentedConnection.
+
+    Every call is summarised per method and entity type: number of calls and
+    errors, entities returned, approximate bytes received, and a latency
+    histogram. Calls taking longer than slow_threshold are also written to the
+    slow query log, one JSON object per line, with the filters that were used.
+
+    Other tools can be plugged in with listeners, eg, to send timings to a
+    metrics server. Each listener is called with the QueryRecord of every call.
+
+    Args:
+        slow_threshold (float): Calls taking at least this many seconds are
+            written to the slow query log
+        slow_log (str|file): Path or open file for the slow query log. Slow
+            queries aren't logged if not given.
+        measure_bytes (bool): If True, results are serialised to estimate their
+            size. This costs some time for very large results.
+        listeners (list[callable]): Called with each QueryRecord
+    """
+
+    def __init__(
+        self, slow_threshold=1.0, slow_log=None, measure_bytes=True, listeners=()
+    ):
+        self.slow_threshold = slow_threshold
+        self.measure_bytes = measure_bytes
+        self.listeners = list(listeners)
+        self.slow_queries = 0
+        self._slow_log = slow_log
+        self._slow_log_file = None
+        self._stats = collections.defaultdict(QueryStats)
+        self._lock = threading.Lock()
+        self._summary_registered = False
+
+    def __repr__(self):
+        return "Instrumentation(slow_threshold={})".format(self.slow_threshold)
+
+    def record(self, record):
+        """
+        Args:
+            record (QueryRecord): Details of a finished call
+        """
+        with self._lock:
+            self._stats[(record.method, record.entity_type)].add(record)
+            if record.elapsed >= self.slow_threshold:
+                self.slow_queries += 1
+                self._log_slow(record)
+        for listener in self.listeners:
+            listener(record)
+
+    def _log_slow(self, record):
+        # Must be called while holding the lock, so lines aren't interleaved
+        if self._slow_log is None:
+            return
+        if self._slow_log_file is None:
+            if hasattr(self._slow_log, "write"):
+                self._slow_log_file = self._slow_log
+            else:
+                self._slow_log_file = open(self._slow_log, "a")
+        line = json.dumps(
+            {
+                "time": time.time(),
+                "pid": os.getpid(),
+                "method": record.method,
+                "entity_type": record.entity_type,
+                "filters": record.filters,
+                "elapsed": record.elapsed,
+                "count": record.count,
+                "bytes": record.size,
+                "error": record.error,
+            },
+            default=str,
+        )
+        self._slow_log_file.write(line + "\n")
+        self._slow_log_file.flush()
+
+    def stats(self):
+        """
+        Returns:
+            dict[str, dict]: Totals for each "method entity_type" called, eg,
+                "find Shot"
+        """
+        with self._lock:
+            return {
+                "{} {}".format(method, entity_type): stats.to_dict()
+                for (method, entity_type), stats in sorted(self._stats.items())
+            }
+
+    def format_summary(self):
+        """
+        Returns:
+            str: Table of the stats, slowest total time first
+        """
+        stats = self.stats()
+        lines = [
+            "{:<32} {:>7} {:>6} {:>9} {:>11} {:>9} {:>8} {:>8} {:>8}".format(
+                "call", "calls", "errors", "results", "bytes", "seconds",
+                "p50", "p90", "max",
+            )
+        ]
+        for name, values in sorted(stats.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(
+                "{:<32} {calls:>7} {errors:>6} {results:>9} {bytes:>11} "
+                "{seconds:>9.3f} {p50:>8.3f} {p90:>8.3f} {max:>8.3f}".format(
+                    name, **values
+                )
+            )
+        lines.append("{} slow queries".format(self.slow_queries))
+        return "\n".join(lines)
+
+    def print_summary_at_exit(self, stream=None):
+        """
+        Prints format_summary when the process exits. Only registers once, no
+        matter how often it's called.
+
+        Args:
+            stream (file): Where to print the summary. Defaults to stderr so it
+                doesn't mix with a script's normal output.
+        """
+        with self._lock:
+            if self._summary_registered:
+                return
+            self._summary_registered = True
+        atexit.register(self._print_summary, stream)
+
+    def _print_summary(self, stream):
+        if self._stats:
+            print(self.format_summary(), file=stream or sys.stderr)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            # Files passed in are left open for whoever opened them
+            opened = self._slow_log_file is not self._slow_log
+            if self._slow_log_file is not None and opened:
+                self._slow_log_file.close()
+            self._slow_log_file = None
+
+
+class InstrumentedConnection(object):
+    """
+    Wraps a Shotgun connection so that find, find_one and summarize calls are
+    timed and recorded. It can be passed anywhere a connection is expected. Any
+    other method is passed straight through to the wrapped connection.
+
+    Use instrument rather than creating this directly, so that connections
+    aren't wrapped at all when instrumentation is turned off.
+
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to wrap
+        instrumentation (Instrumentation): Where to record the calls
+    """
+
+    def __init__(self, sg_connection, instrumentation):
+        self.sg_connection = sg_connection
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self.sg_connection, name)
+
+    def _call(self, method, entity_type, filters, *args, **kwargs):
+        start = time.perf_counter()
+        result = None
+        error = None
+        try:
+            result = getattr(self.sg_connection, method)(
+                entity_type, filters, *args, **kwargs
+            )
+            return result
+        except Exception as exc:
+            error = "{}: {}".format(type(exc).__name__, exc)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if isinstance(result, list):
+                count = len(result)
+            else:
+                count = int(result is not None)
+            size = 0
+            if self.instrumentation.measure_bytes and result is not None:
+                size = len(json.dumps(result, default=str))
+            self.instrumentation.record(
+                QueryRecord(method, entity_type, filters, elapsed, count, size, error)
+            )
+
+    def find(self, entity_type, filters, *args, **kwargs):
+        return self._call("find", entity_type, filters, *args, **kwargs)
+
+    def find_one(self, entity_type, filters, *args, **kwargs):
+        return self._call("find_one", entity_type, filters, *args, **kwargs)
+
+    def summarize(self, entity_type, filters, *args, **kwargs):
+        return self._call("summarize", entity_type, filters, *args, **kwargs)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_default_instrumentation():
+    """
+    Returns:
+        Instrumentation: Shared instrumentation configured from the environment
+            variables, which prints its summary at exit. None if ENABLE_VARIABLE
+            isn't set.
+    """
+    global _default
+    if os.environ.get(ENABLE_VARIABLE, "") in ("", "0"):
+        return None
+    with _default_lock:
+        if _default is None:
+            _default = Instrumentation(slow_log=os.environ.get(SLOW_LOG_VARIABLE))
+            _default.print_summary_at_exit()
+        return _default
+
+
+def instrument(sg_connection, instrumentation=None):
+    """
+    Args:
+        sg_connection (shotgun_api3.Shotgun): Connection to instrument
+        instrumentation (Instrumentation): Where to record calls. Defaults to
+            get_default_instrumentation.
+
+    Returns:
+        shotgun_api3.Shotgun|InstrumentedConnection: The connection, unchanged
+            if instrumentation is turned off, so that it costs nothing
+    """
+    if instrumentation is None:
+        instrumentation = get_default_instrumentation()
+    if instrumentation is None:
+        return sg_connection
+    return InstrumentedConnection(sg_connection, instrumentation)
@@ -0,0 +1,299 @@
+import datetime
+import sqlite3
+import threading
+
+from shotgun_example import iter_find
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sequences (
+    id INTEGER PRIMARY KEY,
+    project_code TEXT,
+    code TEXT,
+    description TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    project_code TEXT,
+    sequence_id INTEGER,
+    code TEXT,
+    description TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS shot_assets (
+    shot_id INTEGER,
+    asset_id INTEGER,
+    asset_type TEXT,
+    asset_name TEXT,
+    position INTEGER,
+    PRIMARY KEY (shot_id, position)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    entity_type TEXT,
+    project_code TEXT COLLATE NOCASE,
+    last_updated_at TEXT,
+    PRIMARY KEY (entity_type, project_code)
+);
+CREATE INDEX IF NOT EXISTS shots_by_sequence ON shots (sequence_id);
+CREATE INDEX IF NOT EXISTS sequences_by_code
+    ON sequences (project_code COLLATE NOCASE, code COLLATE NOCASE);
+"""
+
+# Mirrors created with a different schema are rebuilt by the next sync
+SCHEMA_VERSION = 1
+
+SEQUENCE_FIELDS = ["code", "description", "project.Project.code", "updated_at"]
+SHOT_FIELDS = [
+    "code",
+    "description",
+    "assets",
+    "project.Project.code",
+    "sg_sequence",
+    "updated_at",
+]
+
+
+def _timestamp(value):
+    # Shotgun returns timezone aware datetimes. They're stored in UTC as ISO
+    # strings, which sort in the same order as the times they represent.
+    if value is None:
+        return None
+    return value.astimezone(datetime.timezone.utc).isoformat()
+
+
+class ShotMirror(object):
+    """
+    Local SQLite copy of the Shots, Sequences and Shot asset links of some
+    projects, for tools that need to read them far more often than they change.
+
+    sync only requests the entities that have been updated on the server since
+    the last sync, so keeping the mirror up to date is cheap. Reads never touch
+    the server. Entities that are deleted (retired) on the server don't change
+    their updated_at time, so they're only removed by a full sync.
+
+    Example:
+        mirror = ShotMirror("/tmp/shots.db")
+        mirror.sync(sg_connection, ["myproject"])
+        shots = mirror.get_sequence_shots("myproject", "seq010")
+
+    Args:
+        path (str): SQLite database file. Created if it doesn't exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # The connection is shared between threads, the lock makes sure only one
+        # uses it at a time
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                for table in ("sequences", "shots", "shot_assets", "sync_state"):
+                    self._db.execute("DROP TABLE IF EXISTS {}".format(table))
+                self._db.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+            self._db.executescript(SCHEMA)
+
+    def __repr__(self):
+        return "ShotMirror({!r})".format(self.path)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _last_updated(self, entity_type, project_name):
+        row = self._db.execute(
+            "SELECT last_updated_at FROM sync_state "
+            "WHERE entity_type = ? AND project_code = ?",
+            (entity_type, project_name),
+        ).fetchone()
+        return row[0] if row else None
+
+    def _iter_changed(self, sg_connection, entity_type, project_names, fields, full):
+        # Each project has its own watermark, as projects may have been synced at
+        # different times. Projects with the same watermark are requested
+        # together, and projects that have never been synced are requested in
+        # full.
+        by_last_updated = {}
+        for project_name in project_names:
+            last_updated = None
+            if not full:
+                last_updated = self._last_updated(entity_type, project_name)
+            by_last_updated.setdefault(last_updated, []).append(project_name)
+
+        for last_updated, names in by_last_updated.items():
+            filters = [["project.Project.code", "in", names]]
+            if last_updated is not None:
+                # Entities updated in the same second as the last sync may have
+                # been saved after it read them, so that second is requested
+                # again. Writing the same entity twice is harmless.
+                since = datetime.datetime.fromisoformat(last_updated)
+                since -= datetime.timedelta(seconds=1)
+                filters.append(["updated_at", "greater_than", since])
+            for entity in iter_find(sg_connection, entity_type, filters, fields):
+                yield entity
+
+    def sync(self, sg_connection, project_names, full=False):
+        """
+        Updates the mirror with every Sequence and Shot in the projects that has
+        changed since the last sync.
+
+        Args:
+            sg_connection (shotgun_api3.Shotgun): Connection to sync from
+            project_names (list[str]): Codes of the projects to mirror
+            full (bool): If True, every entity is requested again and anything
+                no longer on the server is removed from the mirror
+
+        Returns:
+            dict[str, int]: Number of entities updated for each entity type
+        """
+        sequences = list(
+            self._iter_changed(
+                sg_connection, "Sequence", project_names, SEQUENCE_FIELDS, full
+            )
+        )
+        shots = list(
+            self._iter_changed(sg_connection, "Shot", project_names, SHOT_FIELDS, full)
+        )
+
+        with self._lock, self._db:
+            if full:
+                placeholders = ",".join("?" * len(project_names))
+                for table in ("sequences", "shots"):
+                    self._db.execute(
+                        "DELETE FROM {} WHERE project_code IN ({})".format(
+                            table, placeholders
+                        ),
+                        project_names,
+                    )
+                self._db.execute(
+                    "DELETE FROM shot_assets "
+                    "WHERE shot_id NOT IN (SELECT id FROM shots)"
+                )
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO sequences VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        sequence["id"],
+                        sequence["project.Project.code"],
+                        sequence["code"],
+                        sequence["description"],
+                        _timestamp(sequence["updated_at"]),
+                    )
+                    for sequence in sequences
+                ],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO shots VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        shot["id"],
+                        shot["project.Project.code"],
+                        (shot["sg_sequence"] or {}).get("id"),
+                        shot["code"],
+                        shot["description"],
+                        _timestamp(shot["updated_at"]),
+                    )
+                    for shot in shots
+                ],
+            )
+            # The asset links of every changed shot are replaced completely, as
+            # assets may have been removed from it as well as added
+            self._db.executemany(
+                "DELETE FROM shot_assets WHERE shot_id = ?",
+                [(shot["id"],) for shot in shots],
+            )
+            self._db.executemany(
+                "INSERT INTO shot_assets VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        shot["id"],
+                        asset["id"],
+                        asset["type"],
+                        asset.get("name"),
+                        position,
+                    )
+                    for shot in shots
+                    for position, asset in enumerate(shot["assets"] or ())
+                ],
+            )
+
+            for entity_type, entities in (("Sequence", sequences), ("Shot", shots)):
+                latest = {}
+                for entity in entities:
+                    timestamp = _timestamp(entity["updated_at"])
+                    project_name = entity["project.Project.code"].lower()
+                    if timestamp is not None and timestamp > latest.get(
+                        project_name, ""
+                    ):
+                        latest[project_name] = timestamp
+                for project_name, timestamp in latest.items():
+                    previous = self._last_updated(entity_type, project_name)
+                    if previous is None or timestamp > previous:
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                            (entity_type, project_name, timestamp),
+                        )
+
+        return {"Sequence": len(sequences), "Shot": len(shots)}
+
+    def get_sequence_shots(self, project_name, sequence_name):
+        """
+        The same as shotgun_example.get_sequence_shots, read from the mirror.
+
+        Args:
+            project_name (str): Project code
+            sequence_name (str): Sequence code
+
+        Returns:
+            list[dict]: Shots with the same fields as get_sequence_shots
+        """
+        with self._lock:
+            rows = self._db.execute(
+                """
+                SELECT shots.id, shots.code, shots.description,
+                    sequences.description AS sequence_description
+                FROM shots JOIN sequences ON shots.sequence_id = sequences.id
+                WHERE sequences.project_code = ? COLLATE NOCASE
+                    AND sequences.code = ? COLLATE NOCASE
+                ORDER BY shots.id
+                """,
+                (project_name, sequence_name),
+            ).fetchall()
+            asset_rows = self._db.execute(
+                """
+                SELECT shot_id, asset_id, asset_type, asset_name FROM shot_assets
+                WHERE shot_id IN (
+                    SELECT shots.id
+                    FROM shots JOIN sequences ON shots.sequence_id = sequences.id
+                    WHERE sequences.project_code = ? COLLATE NOCASE
+                        AND sequences.code = ? COLLATE NOCASE
+                )
+                ORDER BY shot_id, position
+                """,
+                (project_name, sequence_name),
+            ).fetchall()
+
+        assets = {}
+        for row in asset_rows:
+            assets.setdefault(row["shot_id"], []).append(
+                {
+                    "type": row["asset_type"],
+                    "id": row["asset_id"],
+                    "name": row["asset_name"],
+                }
+            )
+        return [
+            {
+                "type": "Shot",
+                "id": row["id"],
+                "code": row["code"],
+                "description": row["description"],
+                "assets": assets.get(row["id"], []),
+                "sg_sequence.Sequence.description": row["sequence_description"],
+            }
+            for row in rows
+        ]
@@ -0,0 +1,241 @@
+import csv
+import io
+import itertools
+import json
+import sys
+
+
+# Columns written for each shot, in order
+COLUMNS = (
+    "project",
+    "sequence",
+    "id",
+    "code",
+    "assets",
+    "description",
+    "sequence_description",
+)
+
+
+def _shot_row(project_name, sequence_name, shot):
+    # The same information print_sequence_info shows for each shot. Only the
+    # number of assets is written, as the links themselves are rarely wanted in
+    # a report and would make it far larger.
+    return (
+        project_name,
+        sequence_name,
+        shot.get("id"),
+        shot.get("code"),
+        len(shot.get("assets") or ()),
+        shot.get("description"),
+        shot.get("sg_sequence.Sequence.description"),
+    )
+
+
+class BufferedWriter(object):
+    """
+    Base class for writers of shot reports that format lines into an in-memory
+    buffer and write it to the stream in large chunks, rather than making a
+    separate write (and often a separate system call) for every line.
+
+    Writers are used as context managers, so that anything left in the buffer is
+    written at the end, eg,
+
+        with JsonLinesWriter(sys.stdout) as writer:
+            shots = iter_sequence_shots(sg, project, sequence)
+            writer.write_shots(sequence, shots, project_name=project)
+
+    Subclasses implement format_rows, and optionally format_header.
+
+    Args:
+        stream (file): Text file-like object to write to
+        buffer_size (int): Approximate number of characters to collect before
+            writing them to the stream
+    """
+
+    # Shots are formatted this many at a time, which is much faster than one at
+    # a time while still writing each page of a generator soon after it arrives
+    batch_size = 500
+
+    def __init__(self, stream, buffer_size=1024 * 1024):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.rows = 0
+        self._buffer = io.StringIO()
+        self._header_written = False
+
+    def __repr__(self):
+        return "{}(rows={})".format(type(self).__name__, self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def format_header(self, buffer):
+        """
+        Writes anything that comes before the first row.
+
+        Args:
+            buffer (io.StringIO): Buffer to write to
+        """
+
+    def format_rows(self, buffer, rows):
+        """
+        Args:
+            buffer (io.StringIO): Buffer to write the lines for the rows to
+            rows (list[tuple]): Values of each of COLUMNS for each row
+        """
+        raise NotImplementedError
+
+    def _write_rows(self, rows):
+        if not self._header_written:
+            self._header_written = True
+            self.format_header(self._buffer)
+        self.format_rows(self._buffer, rows)
+        self.rows += len(rows)
+        if self._buffer.tell() >= self.buffer_size:
+            self.flush()
+
+    def write_shot(self, sequence_name, shot, project_name=None):
+        """
+        Args:
+            sequence_name (str): Sequence the shot belongs to
+            shot (dict): Shot with the fields returned by get_sequence_shots
+            project_name (str): Project the sequence belongs to
+        """
+        self._write_rows([_shot_row(project_name, sequence_name, shot)])
+
+    def write_shots(self, sequence_name, shots, project_name=None):
+        """
+        Args:
+            sequence_name (str): Sequence the shots belong to
+            shots (iterable[dict]): Shots to write. Can be a generator, eg,
+                iter_sequence_shots, in which case shots are written as they
+                arrive rather than waiting for them all.
+            project_name (str): Project the sequence belongs to. Needed to tell
+                sequences with the same code in different projects apart.
+
+        Returns:
+            int: Number of shots written
+        """
+        count = 0
+        shots = iter(shots)
+        while True:
+            rows = [
+                _shot_row(project_name, sequence_name, shot)
+                for shot in itertools.islice(shots, self.batch_size)
+            ]
+            if not rows:
+                return count
+            self._write_rows(rows)
+            count += len(rows)
+
+    def flush(self):
+        """Writes everything in the buffer to the stream."""
+        if self._buffer.tell():
+            self.stream.write(self._buffer.getvalue())
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if hasattr(self.stream, "flush"):
+            self.stream.flush()
+
+
+class JsonLinesWriter(BufferedWriter):
+    """Writes one JSON object per shot, with a key for each of COLUMNS."""
+
+    _encode = json.JSONEncoder(default=str).encode
+
+    def format_rows(self, buffer, rows):
+        encode = self._encode
+        buffer.write(
+            "".join([encode(dict(zip(COLUMNS, row))) + "\n" for row in rows])
+        )
+
+
+class CsvWriter(BufferedWriter):
+    """Writes CSV with a header row of COLUMNS."""
+
+    def format_header(self, buffer):
+        csv.writer(buffer, lineterminator="\n").writerow(COLUMNS)
+
+    def format_rows(self, buffer, rows):
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+
+
+class TextWriter(BufferedWriter):
+    """
+    Writes columns aligned for reading in a terminal. The rows are streamed, so
+    the widths can't be measured from the data; they're fixed by widths instead.
+    Longer values aren't cut short, they push the rest of that line along.
+
+    Args:
+        stream (file): Text file-like object to write to
+        buffer_size (int): Approximate number of characters to collect before
+            writing them to the stream
+        widths (tuple[int]): Width of each of COLUMNS except the last
+    """
+
+    def __init__(
+        self, stream, buffer_size=1024 * 1024, widths=(10, 12, 8, 16, 6, 40)
+    ):
+        super(TextWriter, self).__init__(stream, buffer_size=buffer_size)
+        self._template = (
+            " ".join("{{:<{}}}".format(width) for width in widths) + " {}\n"
+        )
+
+    def format_header(self, buffer):
+        buffer.write(self._template.format(*COLUMNS))
+
+    def format_rows(self, buffer, rows):
+        template = self._template.format
+        buffer.write(
+            "".join(
+                [
+                    template(*["" if value is None else value for value in row])
+                    for row in rows
+                ]
+            )
+        )
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter, "text": TextWriter}
+
+
+def write_sequence_info(sequence_shots, output_format="text", stream=None, **kwargs):
+    """
+    Writes a report of the shots of each sequence, the same information as
+    shotgun_example.print_sequence_info but in a form other tools can read, eg,
+
+        write_sequence_info(get_sequences_shots(sg, project, sequences), "jsonl")
+
+    Args:
+        sequence_shots (dict): Mapping of (project, sequence) or sequence to an
+            iterable of shots, eg, the result of get_sequences_shots
+        output_format (str): One of WRITERS
+        stream (file): Where to write. Defaults to stdout.
+        **kwargs: Extra arguments for the writer, eg, buffer_size
+
+    Raises:
+        ValueError: If output_format isn't known
+
+    Returns:
+        int: Number of shots written
+    """
+    try:
+        writer_class = WRITERS[output_format]
+    except KeyError:
+        raise ValueError(
+            "Unknown format {!r}, must be one of {}".format(
+                output_format, ", ".join(sorted(WRITERS))
+            )
+        )
+    with writer_class(stream or sys.stdout, **kwargs) as writer:
+        for key, shots in sequence_shots.items():
+            if isinstance(key, tuple):
+                project_name, sequence_name = key
+            else:
+                project_name, sequence_name = None, key
+            writer.write_shots(sequence_name, shots, project_name=project_name)
+    return writer.rows
@@ -0,0 +1,204 @@
+import hmac
+import json
+import os
+import threading
+import time
+
+import shotgun_api3
+
+from atomic_write import atomic_write
+
+
+# Suggested token_path for sharing sessions between scripts. Sharing is opt-in,
+# as anyone who can read the file can use the sessions in it.
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser("~"), ".shotgun_sessions.json")
+
+
+class SessionProvider(object):
+    """
+    Provides authenticated Shotgun connections while logging in as rarely as
+    possible.
+
+    Logging in with a password is a slow round trip to the server. Once logged
+    in, the session token is kept and used for every other connection, both in
+    this process and, by saving it to token_path, in other processes that start
+    before it expires.
+
+    A Shotgun connection can't safely be used by two threads at once, so each
+    thread gets its own connection, created the first time that thread asks for
+    one and reused after that. The provider itself can be shared between threads.
+
+    If the server rejects a saved session before token_ttl is up (eg, it was
+    revoked), calls fail with shotgun_api3.AuthenticationFault. Calling reset
+    then makes the next connection log in with the password again.
+
+    Args:
+        site (str): Shotgun site URL
+        user (str): Login
+        password (str): Password
+        token_path (str): JSON file to share session tokens between processes,
+            eg, DEFAULT_TOKEN_PATH. None, the default, only shares them within
+            this process.
+        token_ttl (float): Seconds a session token is reused for. Should be
+            shorter than the site's session timeout.
+    """
+
+    def __init__(
+        self, site, user, password, token_path=None, token_ttl=3600.0
+    ):
+        self.site = site
+        self.user = user
+        self._password = password
+        self.token_path = token_path
+        self.token_ttl = token_ttl
+        self._token = None
+        self._token_expires = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Incremented by reset, so threads know to replace their connection
+        self._generation = 0
+
+    def __repr__(self):
+        return "SessionProvider({!r}, {!r})".format(self.site, self.user)
+
+    @property
+    def _key(self):
+        return "{}|{}".format(self.site, self.user)
+
+    def _load_tokens(self):
+        try:
+            with open(self.token_path) as handle:
+                return json.load(handle)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save_token(self, token, expires):
+        tokens = self._load_tokens()
+        now = time.time()
+        # Expired tokens from any site are dropped so the file doesn't grow forever
+        tokens = {key: value for key, value in tokens.items() if value[1] > now}
+        tokens[self._key] = [token, expires]
+        self._save_token_file(tokens)
+
+    def _save_token_file(self, tokens):
+        # atomic_write creates the file readable only by the current user, which
+        # matters as a session token can be used in place of a password
+        with atomic_write(self.token_path) as handle:
+            json.dump(tokens, handle)
+
+    def _get_token(self):
+        # Must be called while holding the lock
+        now = time.time()
+        if self._token is not None and self._token_expires > now:
+            return self._token
+        if self.token_path is not None:
+            token, expires = self._load_tokens().get(self._key, (None, 0.0))
+            if token is not None and expires > now:
+                self._token, self._token_expires = token, expires
+                return token
+        return None
+
+    def _login(self, password):
+        # Must be called while holding the lock. get_session_token is the first
+        # request the connection makes, so it fails if the password is wrong.
+        sg_connection = shotgun_api3.Shotgun(
+            self.site, login=self.user, password=password
+        )
+        self._token = sg_connection.get_session_token()
+        self._token_expires = time.time() + self.token_ttl
+        if self.token_path is not None:
+            self._save_token(self._token, self._token_expires)
+        return sg_connection
+
+    def _create_connection(self):
+        # Returns the connection and the time its session expires
+        with self._lock:
+            token = self._get_token()
+            if token is not None:
+                sg_connection = shotgun_api3.Shotgun(self.site, session_token=token)
+                return sg_connection, self._token_expires
+
+            # Only one thread logs in, the others wait for its token
+            return self._login(self._password), self._token_expires
+
+    def get_connection(self):
+        """
+        Returns:
+            shotgun_api3.Shotgun: Authenticated connection for the current thread.
+                Replaced once its session is older than token_ttl.
+        """
+        local = self._local
+        if (
+            getattr(local, "generation", None) != self._generation
+            or local.expires <= time.time()
+        ):
+            local.connection, local.expires = self._create_connection()
+            local.generation = self._generation
+        return local.connection
+
+    def check_password(self, password):
+        """
+        Checks a password against the one the provider logs in with. A different
+        password is tried by logging in with it, and used from then on if it
+        works, eg, after the password was changed.
+
+        Args:
+            password (str): Password
+
+        Raises:
+            shotgun_api3.AuthenticationFault: If the password is different and
+                the server rejects it. The provider's password is unchanged.
+        """
+        with self._lock:
+            if hmac.compare_digest(password, self._password):
+                return
+            self._login(password)
+            self._password = password
+
+    def reset(self):
+        """
+        Forgets the session token, both in memory and on disk, so that every
+        thread logs in again the next time it asks for a connection.
+        """
+        with self._lock:
+            self._token = None
+            self._token_expires = 0.0
+            self._generation += 1
+            if self.token_path is not None:
+                tokens = self._load_tokens()
+                if tokens.pop(self._key, None) is not None:
+                    self._save_token_file(tokens)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(site, user, password, **kwargs):
+    """
+    Args:
+        site (str): Shotgun site URL
+        user (str): Login
+        password (str): Password
+        **kwargs: Extra arguments for SessionProvider, eg, token_path
+
+    Returns:
+        SessionProvider: The same provider every time it's called with the same
+            site, user and extra arguments in this process. If the password is
+            different from the one the provider uses, it's only returned once a
+            login with the new password succeeds, eg, after it was changed.
+
+    Raises:
+        shotgun_api3.AuthenticationFault: If the password is different from the
+            provider's and the server rejects it
+    """
+    key = (site, user, tuple(sorted(kwargs.items())))
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = SessionProvider(site, user, password, **kwargs)
+            _providers[key] = provider
+            return provider
+    # Outside the lock, so a slow login doesn't block other sites and users
+    provider.check_password(password)
+    return provider